@@ -22,8 +22,9 @@ from pyScore.config import config
 from pyScore.Guido.objects import core
 from pyScore.Guido.objects.basic import all as basic
 from pyScore.Guido.objects.advanced import all as advanced
-from pyScore.Guido.parser.guido_parser import GuidoParser
+from pyScore.Guido.parser.guido_parser import GuidoParser, PredictiveGuidoParser, StreamingGuidoParser
 from pyScore.Guido.noteserver import save_gif
+from pyScore.Guido.tree_cache import TreeCache
 from pyScore.util.file_wrapper import *
 from pyScore.__version__ import *
 
@@ -35,6 +36,21 @@ from types import StringType, UnicodeType
 # NOTE: Guido is output with latin_1 encoding, because that seems to work with NoteServer
 
 config.add_option("", "--guido-encoding", action="store", default="latin_1", help="[guido] The encoding for Guido files")
+config.add_option("", "--predictive-parser", action="store_true", help="[guido] Parse Guido with the predictive (LL(1)) parser")
+config.add_option("", "--tree-cache", action="store", help="[guido] Cache parsed Guido trees in this directory")
+config.add_option("", "--tree-cache-size", action="store", type="int", default=64, help="[guido] Maximum size of the tree cache, in megabytes")
+
+_tree_caches = {}
+def get_tree_cache():
+   """Returns the TreeCache for the directory in the 'tree-cache'
+   option, or None if it isn't set."""
+   directory = config.get("tree_cache")
+   if not directory:
+      return None
+   if not _tree_caches.has_key(directory):
+      _tree_caches[directory] = TreeCache(
+         directory, config.get("tree_cache_size") << 20)
+   return _tree_caches[directory]
 
 def Guido_file_to_Guido_string(input):
    input = FileReader(input, config.get("guido_encoding"))
@@ -42,10 +58,30 @@ def Guido_file_to_Guido_string(input):
 
 def Guido_string_to_Guido_tree(s):
    assert type(s) in (StringType, UnicodeType)
-   parser = GuidoParser((core, basic, advanced))
+   tags = (core, basic, advanced)
+   cache = get_tree_cache()
+   if cache is not None:
+      key = cache.get_key(s, tags)
+      score = cache.get(key)
+      if score is not None:
+         return score
+   if config.get("predictive_parser"):
+      parser = PredictiveGuidoParser(tags)
+   else:
+      parser = GuidoParser(tags)
    score = parser.parse(s)
+   if cache is not None:
+      cache.put(key, score)
    return score
 
+def stream_Guido_file(input, handler):
+   """Parses a Guido file (a filename or file object) a chunk at a time,
+   passing each event to handler (see pyScore.Guido.handler) rather than
+   building a tree.  Returns the handler."""
+   input = FileReader(input, config.get("guido_encoding"))
+   parser = StreamingGuidoParser((core, basic, advanced))
+   return parser.parse(input, handler)
+
 def Guido_tree_to_Guido_string(score):
    assert isinstance(score, core.Score)
    stream = FileWriter(StringIO(), config.get("guido_encoding"))
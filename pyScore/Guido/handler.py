@@ -0,0 +1,73 @@
+"""
+The interface for objects that receive GUIDO events from a parser
+Python GUIDO tools
+
+Copyright (c) 2002-2008 Michael Droettboom
+"""
+## This program is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License
+## as published by the Free Software Foundation; either version 2
+## of the License, or (at your option) any later version.
+
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+
+## You should have received a copy of the GNU General Public License
+## along with this program; if not, write to the Free Software
+## Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+
+class GuidoHandler:
+   """StreamingGuidoParser calls these methods, in document order, as
+   it parses.  GuidoTreeBuilder has the same interface, but this class
+   does nothing at all, so subclasses can override only the events they
+   need, without any GUIDO objects being created.
+
+   Ranged tags written with parentheses, such as '\\slur(c d)', are
+   passed to add_Tag twice: once with mode 'Begin' and once with mode
+   'End', both with use_parens set."""
+
+   def begin_Segment(self, pos=None):
+      pass
+
+   def end_Segment(self, pos=None):
+      pass
+
+   def begin_Sequence(self, pos=None):
+      pass
+
+   def end_Sequence(self, pos=None):
+      pass
+
+   def begin_Chord(self, pos=None):
+      pass
+
+   def end_Chord(self):
+      pass
+
+   def add_Event(self, pitch_name=None, octave=None, accidental=None,
+                 num=None, den=None, dotting=None, octave2=None, pos=None):
+      pass
+
+   def add_Tag(self, name, id, args, pos=None, mode="", use_parens=False):
+      pass
+
+   def add_Barline(self, pos=None):
+      pass
+
+_handler_methods = [key for key, val in GuidoHandler.__dict__.items()
+                    if callable(val)]
+
+def complete_handler(handler):
+   """Returns a handler that has all of the GuidoHandler methods,
+   calling those of the given handler where it has them."""
+   if isinstance(handler, GuidoHandler):
+      return handler
+   complete = GuidoHandler()
+   for name in _handler_methods:
+      if hasattr(handler, name):
+         setattr(complete, name, getattr(handler, name))
+   return complete
+
+__all__ = "GuidoHandler complete_handler".split()
@@ -0,0 +1,193 @@
+"""
+Checks GUIDO files for problems without building GUIDO trees
+Python GUIDO tools
+
+Copyright (c) 2002-2008 Michael Droettboom
+"""
+## This program is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License
+## as published by the Free Software Foundation; either version 2
+## of the License, or (at your option) any later version.
+
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+
+## You should have received a copy of the GNU General Public License
+## along with this program; if not, write to the Free Software
+## Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+
+from pyScore.config import config
+from pyScore.elementtree.ElementTree import Element, SubElement, ElementTree
+from pyScore.Guido.objects import core
+from pyScore.Guido.objects.basic import all as basic
+from pyScore.Guido.objects.advanced import all as advanced
+from pyScore.Guido.handler import GuidoHandler
+from pyScore.Guido.parser.lexer import ParseError
+from pyScore.Guido.parser.guido_parser import StreamingGuidoParser, StreamingGuidoTokenizer
+from pyScore.Guido import tree_builder
+from pyScore.util.file_wrapper import *
+
+try:
+   import multiprocessing
+except ImportError:
+   multiprocessing = None
+
+config.add_option("", "--guido-encoding", action="store", default="latin_1", help="[guido] The encoding for Guido files")
+config.add_option("", "--xml-encoding", action="store", default="us-ascii", help="[xml] The encoding to save XML files.")
+
+class LintResult:
+   """The problems found in a single file.  Each problem is a tuple
+   (kind, line, column, message), where kind is one of 'error',
+   'syntax-error', 'unknown-tag', 'unclosed-range' or 'unmatched-end',
+   and line and column may be None."""
+
+   def __init__(self, filename):
+      self.filename = filename
+      self.problems = []
+
+   def add(self, kind, pos, message):
+      if pos is None:
+         line = column = None
+      else:
+         line, column = pos.source.get_line_and_column(pos.pos)
+      self.problems.append((kind, line, column, message))
+
+   def is_ok(self):
+      return not len(self.problems)
+
+   def format(self):
+      """Returns the problems as lines of the form
+      'filename:line:column: message'."""
+      lines = []
+      for kind, line, column, message in self.problems:
+         if line is None:
+            lines.append("%s: %s" % (self.filename, message))
+         else:
+            lines.append("%s:%d:%d: %s" % (self.filename, line, column, message))
+      return lines
+
+class GuidoLintHandler(GuidoHandler):
+   """Receives the events from a StreamingGuidoParser and records
+   unknown tags and Begin/End ranges that are not properly matched in
+   a LintResult.  No GUIDO objects are created."""
+
+   def __init__(self, registered_tags, result):
+      self._registered_tags = registered_tags
+      self._result = result
+      self._unknown_tags = {}
+      self._active_tags = []
+
+   def begin_Sequence(self, pos=None):
+      self._active_tags = []
+
+   def end_Sequence(self, pos=None):
+      for name, id, begin_pos in self._active_tags:
+         self._result.add(
+            "unclosed-range", begin_pos,
+            "'\\%sBegin' is never closed." % name)
+      self._active_tags = []
+
+   def add_Tag(self, name, id, args, pos=None, mode="", use_parens=False):
+      name, split_mode = tree_builder.split_tag_name(name, self._registered_tags)
+      if split_mode:
+         mode = split_mode
+      if (not self._registered_tags.has_key(name) and
+          not self._unknown_tags.has_key(name)):
+         self._unknown_tags[name] = None
+         self._result.add("unknown-tag", pos, "Unknown tag '\\%s'." % name)
+      if mode == "Begin":
+         self._active_tags.append((name, id, pos))
+      elif mode == "End":
+         active_tags = self._active_tags
+         for i in range(len(active_tags) - 1, -1, -1):
+            if active_tags[i][0] == name and active_tags[i][1] == id:
+               del active_tags[i]
+               break
+         else:
+            self._result.add(
+               "unmatched-end", pos,
+               "'\\%sEnd' appears before '\\%sBegin'." % (name, name))
+
+_parser = None
+_registered_tags = None
+
+def lint_Guido_file(filename):
+   """Parses the given GUIDO file and returns a LintResult of the
+   problems found in it."""
+   global _parser, _registered_tags
+   if _parser is None:
+      _parser = StreamingGuidoParser((core, basic, advanced))
+      _registered_tags = tree_builder.get_registered_tags((core, basic, advanced))
+   result = LintResult(filename)
+   handler = GuidoLintHandler(_registered_tags, result)
+   try:
+      fd = FileReader(filename, config.get("guido_encoding"))
+      try:
+         tokens = _parser.top(StreamingGuidoTokenizer(fd), handler)
+         if not tokens.at_end():
+            result.add("syntax-error", tokens.get_position(tokens.index),
+                       "Extra text at end of file.")
+      finally:
+         fd.close()
+   except ParseError, e:
+      result.problems.append(
+         ("syntax-error",) + e.get_line_and_column() + (e.message,))
+   except (IOError, UnicodeError), e:
+      result.problems.append(("error", None, None, str(e)))
+   return result
+
+def lint_Guido_files(filenames, jobs=None):
+   """Lints each of the given files, yielding a LintResult for each in
+   order.  The files are spread across 'jobs' processes (by default,
+   or if 0, one per CPU) when the multiprocessing module is
+   available."""
+   if multiprocessing is None:
+      jobs = 1
+   elif not jobs:
+      jobs = multiprocessing.cpu_count()
+   jobs = min(jobs, len(filenames))
+   if jobs <= 1:
+      for filename in filenames:
+         yield lint_Guido_file(filename)
+      return
+   # Send the files in batches, so the workers aren't starved by the
+   # overhead of passing them one at a time
+   chunksize = max(1, min(64, len(filenames) / (jobs * 4)))
+   pool = multiprocessing.Pool(jobs)
+   try:
+      for result in pool.imap(lint_Guido_file, filenames, chunksize):
+         yield result
+      pool.close()
+   finally:
+      pool.terminate()
+      pool.join()
+
+def write_summary(results, fd):
+   """Writes an XML summary of the given LintResults to the file
+   object fd."""
+   root = Element("guido-lint")
+   files = failed = 0
+   for result in results:
+      files += 1
+      element = SubElement(root, "file", name=result.filename)
+      if result.is_ok():
+         element.set("status", "ok")
+      else:
+         failed += 1
+         element.set("status", "failed")
+      for kind, line, column, message in result.problems:
+         problem = SubElement(element, kind)
+         if line is not None:
+            problem.set("line", str(line))
+            problem.set("column", str(column))
+         problem.text = message
+   root.set("files", str(files))
+   root.set("failed", str(failed))
+   ElementTree(root).write(fd, config.get("xml_encoding"))
+   fd.write("\n")
+
+__all__ = """
+LintResult GuidoLintHandler lint_Guido_file lint_Guido_files write_summary
+""".split()
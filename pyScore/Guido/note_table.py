@@ -0,0 +1,140 @@
+"""
+A columnar view of the notes in a GUIDO tree
+Python GUIDO tools
+
+Copyright (c) 2002-2008 Michael Droettboom
+"""
+## This program is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License
+## as published by the Free Software Foundation; either version 2
+## of the License, or (at your option) any later version.
+
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+
+## You should have received a copy of the GNU General Public License
+## along with this program; if not, write to the Free Software
+## Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+
+from pyScore.Guido.objects import core
+
+from array import array
+try:
+   import numpy
+except ImportError:
+   numpy = None
+
+# The MIDI pitch of GUIDO's c0 (get_absolute_pitch is 0 for c0)
+MIDI_PITCH_OFFSET = 48
+
+class NoteTable:
+   """The notes of a GUIDO Score as parallel columns, one row per note,
+   in the order of the sequences and then of onset within a sequence.
+
+     sequence:   the index of the note's sequence (voice) in the score
+     onset:      the start of the note, in ticks
+     duration:   the duration of the note, in ticks
+     pitch:      the MIDI pitch of the note
+     accidental: the alteration of the note, in semitones
+     measure:    the measure containing the note, counting from 1
+
+   There are ticks_per_whole ticks in a whole note, which by default is
+   that of the score's time base (see calc_time_spines), so every
+   onset and duration is exact.
+
+   Each column is a NumPy array if NumPy is available, or an
+   array.array otherwise.  With NumPy, 'records' is also a structured
+   array of the whole table (whose columns share the same memory)."""
+
+   # (name, array.array typecode, NumPy dtype)
+   columns = [("sequence", "i", "i4"),
+              ("onset", "l", "i8"),
+              ("duration", "l", "i8"),
+              ("pitch", "h", "i2"),
+              ("accidental", "b", "i1"),
+              ("measure", "i", "i4")]
+
+   def __init__(self, score, ticks_per_whole=None):
+      assert isinstance(score, core.Score)
+      time_base = score.calc_time_spines()
+      rows = self._get_rows(score, time_base.ticks_per_whole)
+      if ticks_per_whole is None or ticks_per_whole == time_base.ticks_per_whole:
+         ticks_per_whole = time_base.ticks_per_whole
+         to_ticks = None
+      else:
+         to_ticks = core.TimeBase(ticks_per_whole).to_ticks
+      self.ticks_per_whole = ticks_per_whole
+
+      data = {}
+      for name, typecode, dtype in self.columns:
+         data[name] = array(typecode)
+      sequence = data["sequence"].append
+      onset = data["onset"].append
+      duration = data["duration"].append
+      pitch = data["pitch"].append
+      accidental = data["accidental"].append
+      measure = data["measure"].append
+      for sequence_no, onset_ticks, duration_ticks, note, measure_no in rows:
+         if to_ticks is not None:
+            onset_ticks = to_ticks(time_base.to_rat(onset_ticks))
+            duration_ticks = to_ticks(time_base.to_rat(duration_ticks))
+         sequence(sequence_no)
+         onset(onset_ticks)
+         duration(duration_ticks)
+         pitch(note.get_absolute_pitch() + MIDI_PITCH_OFFSET)
+         accidental(core.PITCHED.accidentals_to_semitones[note.accidental])
+         measure(measure_no)
+      self._length = len(rows)
+
+      if numpy is None:
+         self.records = None
+         self._data = data
+      else:
+         self.records = numpy.empty(
+            self._length, [(name, dtype) for name, typecode, dtype in self.columns])
+         self._data = {}
+         for name, typecode, dtype in self.columns:
+            column = self.records[name]
+            column[:] = numpy.frombuffer(data[name], numpy.dtype(typecode))
+            self._data[name] = column
+
+   def _get_rows(self, score, ticks_per_whole):
+      """Walks the score, whose time spines have been calculated with
+      ticks_per_whole ticks in a whole note, returning a list of rows
+      (sequence number, onset and duration in those ticks, note,
+      measure number)."""
+      rows = []
+      append = rows.append
+      for sequence_no, sequence in enumerate(score.toplevel.collection):
+         measure_no = 1
+         for item in sequence.collection:
+            if isinstance(item, core.Barline):
+               measure_no += 1
+               continue
+            if isinstance(item, core.Chord):
+               notes = [x for x in item.visit_flat() if isinstance(x, core.Note)]
+            elif isinstance(item, core.Note):
+               notes = [item]
+            elif isinstance(item, core.DURATIONAL):
+               notes = []
+            else:
+               continue
+            for note in notes:
+               append((sequence_no, item.ticks, note.get_ticks(ticks_per_whole),
+                       note, measure_no))
+      return rows
+
+   def __len__(self):
+      return self._length
+
+   def __getitem__(self, name):
+      """Returns the column with the given name."""
+      return self._data[name]
+
+   def keys(self):
+      """Returns the names of the columns."""
+      return [name for name, typecode, dtype in self.columns]
+
+__all__ = ["NoteTable"]
@@ -23,6 +23,9 @@ from pyScore.Guido.objects import core
 from pyScore.Guido.objects.basic.text import TEXT
 
 class lyrics(TEXT):
+   # Each occurrence keeps its own syllable map
+   shareable = False
+
    def __init__(self, name, id, args_list, args_dict, *args, **kwargs):
       TEXT.__init__(self, name, id, args_list, args_dict, *args, **kwargs)
       self.parse_lyrics()
@@ -32,12 +35,46 @@ class lyrics(TEXT):
       self.syllables = [x.replace("~", " ").replace("__", "_")
                         for x in text.split()]
 
+   def span_closed(self):
+      TEXT.span_closed(self)
+      self._syllable_indices = self.get_syllable_indices()
+
+   def get_syllable_indices(self):
+      """Matches the syllables to the notes and chords of the lyric,
+      ignoring all tags, rests and other elements, in one pass.
+      Returns a dictionary from the index of each note or chord in the
+      parent collection to the number of its syllable."""
+      indices = {}
+      num_syllables = len(self.syllables)
+      if not num_syllables:
+         return indices
+      collection = self.parent.collection
+      i = 0
+      for index in xrange(self.span_start, self.span_end):
+         item = collection[index]
+         if isinstance(item, core.Note) or isinstance(item, core.Chord):
+            indices[index] = i
+            i += 1
+            if i >= num_syllables:
+               break
+      return indices
+
    def get_syllable(self, note):
-      """We need to figure out which syllable this note corresponds
-      to, ignoring all tags, rests and other elements.  This is a
-      time consuming process, but is the most straightforward, since
-      we would not get the notes in nested tags through 'append'.
-      """
+      """Returns the syllable for the given note or chord, and whether
+      it is the last syllable.  Notes that are part of a chord, or that
+      have no syllable, get an empty syllable."""
+      if self.span_end is None:
+         # Still open, or the events were set explicitly
+         return self._find_syllable(note)
+      if (note.parent is self.parent and note.index is not None and
+          self.parent.collection[note.index] is note):
+         i = self._syllable_indices.get(note.index)
+         if i is not None:
+            return self.syllables[i], (i == len(self.syllables) - 1)
+      # We fail silently
+      return "", False
+
+   def _find_syllable(self, note):
       i = 0
       for item in self.events:
          if isinstance(item, core.Note) or isinstance(item, core.Chord):
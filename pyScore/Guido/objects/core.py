@@ -24,6 +24,7 @@ from pyScore.util.rational import Rat
 from pyScore.Guido.parser.lexer import ParseError, Position
 from pyScore.util.structures import SortedListSet
 
+from bisect import bisect_right
 import sys
 try:
     import textwrap
@@ -33,58 +34,266 @@ except ImportError:
 class GuidoError(Exception):
     pass
 
+class _NoTags(dict):
+    """The tags of an object that has none.  A single read-only instance
+    is shared by all such objects, so they don't each need their own
+    dictionary."""
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("Use add_tag to add a tag to a GUIDO object.")
+    __setitem__ = __delitem__ = setdefault = update = _read_only
+    pop = popitem = clear = _read_only
+
+no_tags = _NoTags()
+
+def _gcd(a, b):
+    while b:
+        a, b = b, a % b
+    return a
+
+class TimeBase(object):
+    """The unit of the integer onsets ('ticks') of GUIDO objects:
+    there are ticks_per_whole ticks in a whole note.  calc_time_spines
+    chooses one that makes every onset and duration in the score a
+    whole number of ticks, so they can be added and compared as plain
+    integers."""
+    __slots__ = ('ticks_per_whole',)
+
+    def __init__(self, ticks_per_whole):
+        self.ticks_per_whole = ticks_per_whole
+
+    def to_rat(self, ticks):
+        return Rat(ticks, self.ticks_per_whole)
+
+    def to_ticks(self, rat):
+        ticks = rat.num * self.ticks_per_whole
+        if ticks % rat.den:
+            raise ValueError("%s is not a whole number of ticks, with %d ticks per whole note." %
+                             (rat, self.ticks_per_whole))
+        return ticks / rat.den
+
+_whole_notes = TimeBase(1)
+
+class TagSpans(object):
+    """An interval index of the range tags (those with Begin and End,
+    or parentheses) of a collection.  Each tag covers the items of the
+    collection from tag.span_start up to, but not including,
+    tag.span_end, which is None while the tag is still open.  Tags are
+    added in order of span_start, so each class of tag keeps a sorted
+    list of starts to bisect, plus a running maximum of the ends that
+    tells a query when there are no more covering tags further back."""
+    __slots__ = ('_tags', '_starts', '_max_ends')
+
+    def __init__(self):
+        # tag class name -> [tags], in order of span_start
+        self._tags = {}
+        # tag class name -> [span_start of each tag]
+        self._starts = {}
+        # tag class name -> [running maximum of span_end], built lazily
+        self._max_ends = {}
+
+    def add(self, tag):
+        name = tag.__class__.__name__
+        if self._tags.has_key(name):
+            self._tags[name].append(tag)
+            self._starts[name].append(tag.span_start)
+        else:
+            self._tags[name] = [tag]
+            self._starts[name] = [tag.span_start]
+        self._max_ends.pop(name, None)
+
+    def close(self, tag):
+        self._max_ends.pop(tag.__class__.__name__, None)
+
+    def _get_max_ends(self, name):
+        max_ends = self._max_ends.get(name)
+        if max_ends is None:
+            max_ends = []
+            max_end = -1
+            for tag in self._tags[name]:
+                end = tag.span_end
+                if end is None:
+                    end = sys.maxint
+                if end > max_end:
+                    max_end = end
+                max_ends.append(max_end)
+            self._max_ends[name] = max_ends
+        return max_ends
+
+    def get_tags(self, index, name):
+        """Returns the tags of the given class name that cover the item
+        at index, in the order they begin."""
+        starts = self._starts.get(name)
+        if starts is None:
+            return []
+        i = bisect_right(starts, index) - 1
+        if i < 0:
+            return []
+        max_ends = self._max_ends.get(name)
+        if max_ends is None:
+            max_ends = self._get_max_ends(name)
+        tags = self._tags[name]
+        found = []
+        while i >= 0 and max_ends[i] > index:
+            end = tags[i].span_end
+            if end is None or end > index:
+                found.append(tags[i])
+            i -= 1
+        found.reverse()
+        return found
+
+    def get_all_tags(self, index):
+        """Returns a dictionary from tag class names to the tags that
+        cover the item at index."""
+        result = {}
+        for name in self._tags.keys():
+            found = self.get_tags(index, name)
+            if len(found):
+                result[name] = found
+        return result
+
+# How _flatten treats the notes of chords
+_ALL_NOTES, _NO_NOTES, _FIRST_NOTE = range(3)
+
+def _flatten(root, chord_notes=_ALL_NOTES):
+    """Returns a list of root and all of the objects in it, depth
+    first.  The tree is walked with an explicit stack, so its depth is
+    not limited by the recursion limit."""
+    result = []
+    append = result.append
+    stack = [root]
+    pop = stack.pop
+    push = stack.extend
+    while len(stack):
+        item = pop()
+        append(item)
+        if isinstance(item, COLLECTION):
+            if chord_notes != _ALL_NOTES and isinstance(item, Chord):
+                if chord_notes == _FIRST_NOTE and len(item.collection):
+                    append(item.collection[0])
+                continue
+            push(reversed(item.collection))
+    return result
+
+# Incremented whenever a collection is appended to, so that cached
+# traversals (see Score) know when they are out of date
+_generation = 0
+
 class GUIDO_OBJECT(object):
+    # The objects there are many of (notes, rests, chords, barlines and
+    # tags) define __slots__ so they have no instance dictionary.  All
+    # of the mixins they are built from must define empty __slots__.
+    # 'index' is the position of the object in its parent's collection.
+    # 'staff' is for the converters to fill in.
+    __slots__ = ('pos', '_tags', 'parent', 'index', 'ticks', 'time_base', 'staff')
+
     def __init__(self, pos=None):
         if not pos is None:
             assert isinstance(pos, Position)
         self.pos = pos
-        self.tags = {}
+        self._tags = None
         self.parent = None
-        self.time_spine = Rat(0, 1)
+        self.index = None
+        self.ticks = 0
+        self.time_base = _whole_notes
+
+    def _get_time_spine(self):
+        return Rat(self.ticks, self.time_base.ticks_per_whole)
+    def _set_time_spine(self, time_spine):
+        self.time_base = TimeBase(time_spine.den)
+        self.ticks = time_spine.num
+    time_spine = property(_get_time_spine, _set_time_spine,
+                          doc="The onset of the object, as a Rat (see calc_time_spines)")
+
+    def _get_spans(self):
+        parent = self.parent
+        if parent is None:
+            return None
+        return parent.tag_spans
+
+    def _get_tags(self):
+        spans = self._get_spans()
+        if spans is None:
+            tags = {}
+        else:
+            tags = spans.get_all_tags(self.index)
+        if self._tags is not None:
+            for name, val in self._tags.items():
+                tags[name] = val + tags.get(name, [])
+        if not len(tags):
+            return no_tags
+        return tags
+    def _set_tags(self, tags):
+        self._tags = tags
+    tags = property(_get_tags, _set_tags,
+                    doc="The tags that apply to this object, by tag class name")
+
+    def add_tag(self, tag):
+        """Adds a tag to those that apply to this object, in addition
+        to the range tags that cover it in its parent collection."""
+        tags = self._tags
+        if tags is None:
+            tags = self._tags = {}
+        tags.setdefault(tag.__class__.__name__, []).append(tag)
 
     def write_guido(self, stream, state={}):
         stream.write("[ERROR! Undefined GUIDO object in stream.]")
 
     def visit_flat(self):
-        yield self
-        if hasattr(self, "collection"):
-            for a in self.collection:
-                for b in a.visit_flat():
-                    yield b
+        """Iterates over this object and all of the objects in it,
+        depth first."""
+        return iter(_flatten(self, _ALL_NOTES))
 
     def visit_flat_with_chords(self):
-        yield self
-        if hasattr(self, "collection") and not isinstance(self, Chord):
-            for a in self.collection:
-                for b in a.visit_flat_with_chords():
-                    yield b
+        """Like visit_flat, but without the notes of chords."""
+        return iter(_flatten(self, _NO_NOTES))
 
     def visit_flat_chord_first_note(self):
-        yield self
-        if isinstance(self, Chord):
-            if len(self.collection):
-                yield self.collection[0]
-        elif hasattr(self, "collection"):
-            for a in self.collection:
-                for b in a.visit_flat_chord_first_note():
-                    yield b
+        """Like visit_flat, but with only the first note of each chord."""
+        return iter(_flatten(self, _FIRST_NOTE))
+
+    def get_ticks_per_whole(self):
+        """Returns the least common denominator of the durations of
+        all the objects in this one."""
+        ticks_per_whole = 1
+        for item in self.visit_flat():
+            if isinstance(item, DURATIONAL) and not isinstance(item, Chord):
+                den = item.get_duration_den()
+                ticks_per_whole = ticks_per_whole * den / _gcd(ticks_per_whole, den)
+        return ticks_per_whole
 
     def calc_time_spines(self, start=Rat(0, 1)):
-        time_spine = start
+        """Sets the onset of every object in this one ('ticks', in the
+        returned TimeBase).  The time_spine of each object is then its
+        onset as a Rat."""
+        ticks_per_whole = self.get_ticks_per_whole()
+        ticks_per_whole = ticks_per_whole * start.den / _gcd(ticks_per_whole, start.den)
+        time_base = TimeBase(ticks_per_whole)
+        start = ticks = time_base.to_ticks(start)
         for item in self.visit_flat_with_chords():
             if isinstance(item, Sequence):
-                time_spine = start
-            item.time_spine = time_spine
+                ticks = start
+            item.ticks = ticks
+            item.time_base = time_base
             # "Time stands still" within a Chord
             if isinstance(item, Chord):
-                item.time_spine = time_spine
                 notes = list(item.visit_flat())
                 for a in notes[1:]:
-                    a.time_spine = time_spine
-            time_spine += item.get_duration()
+                    a.ticks = ticks
+                    a.time_base = time_base
+            ticks += item.get_ticks(ticks_per_whole)
+        return time_base
 
     def get_tag(self, tag_name):
-        return self.tags.get(tag_name, {})
+        parent = self.parent
+        if parent is None or parent.tag_spans is None:
+            found = []
+        else:
+            found = parent.tag_spans.get_tags(self.index, tag_name)
+        if self._tags is not None:
+            found = self._tags.get(tag_name, []) + found
+        if not len(found):
+            return {}
+        return found
 
     def raise_error(self, message):
         if self.pos == None:
@@ -94,24 +303,52 @@ class GUIDO_OBJECT(object):
     def get_duration(self):
         return Rat(0, 1)
 
+    def get_ticks(self, ticks_per_whole):
+        """Returns the duration in ticks, with ticks_per_whole ticks in
+        a whole note."""
+        return 0
+
     def set_duration(self, num, den, dotting=0):
         pass
 
 class COLLECTION(GUIDO_OBJECT):
+    __slots__ = ('collection', 'tag_spans')
     separator = ' '
     parens = '[]'
 
     def __init__(self, *args, **kwargs):
         GUIDO_OBJECT.__init__(self, *args, **kwargs)
         self.collection = []
+        self.tag_spans = None
 
     def __repr__(self):
         return "<" + self.__class__.__name__ + ": " + repr(self.collection) + ">"
 
     def append(self, item):
+        global _generation
+        _generation += 1
+        item.index = len(self.collection)
         self.collection.append(item)
         item.parent = self
 
+    def begin_tag_span(self, tag):
+        """Makes the range tag cover the items appended from now on,
+        until end_tag_span is called.  The tag's parent becomes this
+        collection, if it isn't already."""
+        tag.parent = self
+        tag._events = None
+        tag.span_start = len(self.collection)
+        tag.span_end = None
+        if self.tag_spans is None:
+            self.tag_spans = TagSpans()
+        self.tag_spans.add(tag)
+
+    def end_tag_span(self, tag):
+        """Stops the range tag from covering any more items."""
+        tag.span_end = len(self.collection)
+        tag.span_closed()
+        self.tag_spans.close(tag)
+
 class NULL_COLLECTION(COLLECTION):
     def append(self, item):
         pass
@@ -120,6 +357,8 @@ class NULL_COLLECTION(COLLECTION):
         pass
 
 class INLINE_COLLECTION(COLLECTION):
+    __slots__ = ()
+
     def write_guido(self, stream, state={}):
         if len(self.collection):
             stream.write(self.parens[0])
@@ -134,14 +373,61 @@ class NONINLINE_COLLECTION(COLLECTION):
     def write_guido(self, stream, state={}):
         pass
 
+class _FlatCache(object):
+    """The flattened traversals and time index of a Score.  They are
+    left behind when the score is pickled or deep-copied."""
+    __slots__ = ('generation', 'lists', 'time_index')
+
+    def __init__(self):
+        self.generation = None
+        # _flatten's chord_notes -> list
+        self.lists = {}
+        self.time_index = None
+
+    def __reduce__(self):
+        return (_FlatCache, ())
+
 class Score(INLINE_COLLECTION):
     parens = '  '
 
     def __init__(self, *args, **kwargs):
         INLINE_COLLECTION.__init__(self, *args, **kwargs)
         self._dict = dict
+        self._flat_cache = _FlatCache()
+
+    def _get_cache(self):
+        """The converters walk the same score several times, so its
+        traversals are kept until something is appended to any
+        collection."""
+        cache = self.__dict__.get('_flat_cache')
+        if cache is None:
+            # A score from before traversals were cached
+            cache = self._flat_cache = _FlatCache()
+        if cache.generation != _generation:
+            cache.lists = {}
+            cache.time_index = None
+            cache.generation = _generation
+        return cache
+
+    def _get_flat(self, chord_notes):
+        cache = self._get_cache()
+        flat = cache.lists.get(chord_notes)
+        if flat is None:
+            flat = cache.lists[chord_notes] = _flatten(self, chord_notes)
+        return flat
+
+    def visit_flat(self):
+        return iter(self._get_flat(_ALL_NOTES))
+
+    def visit_flat_with_chords(self):
+        return iter(self._get_flat(_NO_NOTES))
+
+    def visit_flat_chord_first_note(self):
+        return iter(self._get_flat(_FIRST_NOTE))
 
     def append(self, item):
+        global _generation
+        _generation += 1
         # We always have a top level Segment, even if it
         # contains only one part (Sequence)
         if len(self.collection):
@@ -160,10 +446,29 @@ class Score(INLINE_COLLECTION):
     def write_guido(self, stream, state={}):
         self.toplevel.write_guido(stream, state)
 
+    def get_time_index(self):
+        """Returns an index of the score by time (see
+        pyScore.Guido.time_index.TimeIndex).  It is kept until
+        something is appended to the score; after changing the
+        durations of its events, build a new TimeIndex instead."""
+        cache = self._get_cache()
+        if cache.time_index is None:
+            from pyScore.Guido.time_index import TimeIndex
+            cache.time_index = TimeIndex(self)
+        return cache.time_index
+
+    def to_note_table(self, ticks_per_whole=None):
+        """Returns the notes in the score as a table of columns (see
+        pyScore.Guido.note_table.NoteTable)."""
+        from pyScore.Guido.note_table import NoteTable
+        return NoteTable(self, ticks_per_whole)
+
 ########################################
 # Notes and rests
 
 class DURATIONAL(GUIDO_OBJECT):
+    # The '_num', '_den' and '_dotting' slots are in the subclasses
+    __slots__ = ()
     one_dot = Rat(3, 2)
     two_dots = Rat(7, 4)
 
@@ -219,6 +524,33 @@ class DURATIONAL(GUIDO_OBJECT):
             return Rat(self._num * self.two_dots.num, self._den * self.two_dots.den)
         self.raise_error("Too many dots.")
 
+    def get_duration_den(self):
+        """Returns the denominator of the duration (not necessarily
+        reduced)."""
+        if self._dotting == 0:
+            return self._den
+        elif self._dotting == 1:
+            return self._den * self.one_dot.den
+        elif self._dotting == 2:
+            return self._den * self.two_dots.den
+        self.raise_error("Too many dots.")
+
+    def get_ticks(self, ticks_per_whole):
+        num = self._num * ticks_per_whole
+        den = self._den
+        if self._dotting == 1:
+            num *= self.one_dot.num
+            den *= self.one_dot.den
+        elif self._dotting == 2:
+            num *= self.two_dots.num
+            den *= self.two_dots.den
+        elif self._dotting != 0:
+            self.raise_error("Too many dots.")
+        if num % den:
+            self.raise_error("The duration is not a whole number of ticks, with %d ticks per whole note." %
+                             ticks_per_whole)
+        return num / den
+
     def __repr__(self):
         return "*%d/%d%s" % (self.num, self.den, '.' * self.dotting)
 
@@ -257,6 +589,9 @@ class DURATIONAL(GUIDO_OBJECT):
     dotting = property(_get_dotting, _set_dotting)
 
 class PITCHED(GUIDO_OBJECT):
+    # The '_pitch_name', '_octave', '_accidental' and '_volume' slots
+    # are in the subclasses
+    __slots__ = ()
     solfege_pitch_names = 'do re mi me fa sol la ti si h'.split()
     normal_pitch_names = list("abcedfg")
     pitch_names = solfege_pitch_names + normal_pitch_names
@@ -345,9 +680,11 @@ class PITCHED(GUIDO_OBJECT):
                 (12 * (self._octave)))
 
 class EVENT(GUIDO_OBJECT):
-    pass
+    __slots__ = ()
 
 class Rest(EVENT, DURATIONAL):
+    __slots__ = ('_num', '_den', '_dotting')
+
     def __init__(self, num, den=None, dotting=0, *args, **kwargs):
         DURATIONAL.__init__(self, num, den, dotting, *args, **kwargs)
 
@@ -360,6 +697,8 @@ class Rest(EVENT, DURATIONAL):
         DURATIONAL.write_guido(self, stream, state)
 
 class Empty(EVENT, DURATIONAL):
+    __slots__ = ('_num', '_den', '_dotting')
+
     def __init__(self, num, den=None, dotting=0, *args, **kwargs):
         DURATIONAL.__init__(self, num, den, dotting, *args, **kwargs)
 
@@ -372,6 +711,9 @@ class Empty(EVENT, DURATIONAL):
         DURATIONAL.write_guido(self, stream, state)
 
 class Note(EVENT, PITCHED, DURATIONAL):
+    __slots__ = ('_pitch_name', '_octave', '_accidental', '_volume',
+                 '_num', '_den', '_dotting')
+
     def __init__(self, pitch_name, octave, accidental,
                  num, den=None, dotting=None, *args, **kwargs):
         PITCHED.__init__(self, pitch_name, octave, accidental, *args, **kwargs)
@@ -390,9 +732,21 @@ class Note(EVENT, PITCHED, DURATIONAL):
 # TAGS
 
 class TAG(GUIDO_OBJECT):
+    # A range tag covers the items of its parent collection from
+    # span_start to span_end (see COLLECTION.begin_tag_span), which are
+    # its 'events'.  Other tags have no events, unless they are set
+    # explicitly.  first_event and last_event are the first and last of
+    # the events that are notes or chords, set when the span is closed.
+    __slots__ = ('name', 'id', 'mode', 'use_parens', 'starts_group',
+                 'args_list', 'args_dict', '_events', 'span_start', 'span_end',
+                 'first_event', 'last_event', 'end_tag')
     default = 0
     parens = '()'
     separator = ' '
+    # Whether identical occurrences of the tag may share their
+    # arguments and attributes (see new_occurrence).  Tags whose
+    # attributes change after they are built must set this to False.
+    shareable = True
 
     def __init__(self, name_, id_, args_list, args_dict, *args, **kwargs):
         self.name = name_
@@ -402,10 +756,40 @@ class TAG(GUIDO_OBJECT):
         self.starts_group = 0
         self.args_list = list(args_list)
         self.args_dict = args_dict
-        self.events = []
+        self._events = None
+        self.span_start = None
+        self.span_end = None
+        self.first_event = None
+        self.last_event = None
         self.end_tag = None
         GUIDO_OBJECT.__init__(self, *args, **kwargs)
 
+    def new_occurrence(self, pos=None):
+        """Returns a new tag with the same name and arguments as this
+        one, but its own position, mode and place in the tree.  Its
+        argument list and dictionary, and its instance dictionary
+        (whatever its class worked out from the arguments), are shared
+        with this tag rather than rebuilt."""
+        cls = self.__class__
+        tag = cls.__new__(cls)
+        GUIDO_OBJECT.__init__(tag, pos)
+        tag.name = self.name
+        tag.id = self.id
+        tag.mode = ""
+        tag.use_parens = False
+        tag.starts_group = 0
+        tag.args_list = self.args_list
+        tag.args_dict = self.args_dict
+        tag._events = None
+        tag.span_start = None
+        tag.span_end = None
+        tag.first_event = None
+        tag.last_event = None
+        tag.end_tag = None
+        if hasattr(self, '__dict__'):
+            tag.__dict__ = self.__dict__
+        return tag
+
     def __repr__(self):
         items = (['"%s"' % x for x in self.args_list] +
                  ['%s="%s"' % (key, val)
@@ -416,6 +800,22 @@ class TAG(GUIDO_OBJECT):
             args = ""
         return "<Tag \\%s%s:%s%s >" % (self.name, self.mode, self.id, args)
 
+    def _get_events(self):
+        if self._events is not None:
+            return self._events
+        if self.span_start is None:
+            return []
+        end = self.span_end
+        if end is None:
+            return self.parent.collection[self.span_start:]
+        return self.parent.collection[self.span_start:end]
+    def _set_events(self, events):
+        self._events = events
+        self.span_start = self.span_end = None
+        self.first_event = self.last_event = None
+    events = property(_get_events, _set_events,
+                      doc="The objects the tag applies to, in order")
+
     def _get_full_name(self):
         return "%s:%s" % (self.name, self.id)
     full_name = property(_get_full_name)
@@ -452,30 +852,66 @@ class TAG(GUIDO_OBJECT):
         if self.use_parens:
             stream.write("(")
 
-    def is_first(self, note):
-        for n in self.events:
-            if isinstance(n, (Note, Chord)):
-                if isinstance(n, Note):
-                    if n is note:
-                        return True
-                elif isinstance(n, Chord):
-                    if note in n.collection:
-                        return True
-                return False
+    def span_closed(self):
+        """Called when the span of a range tag is closed, so that
+        things about its events can be worked out once, rather than for
+        each event.  Records the first and last events that are notes
+        or chords."""
+        self.first_event, self.last_event = self.find_first_and_last()
+
+    def find_first_and_last(self):
+        """Returns the first and last of the events that are notes or
+        chords, or (None, None) if there are none."""
+        if self._events is None and self.span_start is not None:
+            collection = self.parent.collection
+            start = self.span_start
+            end = self.span_end
+            if end is None:
+                end = len(collection)
+        else:
+            collection = self.events
+            start = 0
+            end = len(collection)
+        first = last = None
+        for i in xrange(start, end):
+            if isinstance(collection[i], (Note, Chord)):
+                first = collection[i]
+                break
+        else:
+            return None, None
+        for i in xrange(end - 1, start - 1, -1):
+            if isinstance(collection[i], (Note, Chord)):
+                last = collection[i]
+                break
+        return first, last
+
+    def _is_event(self, event, note):
+        if event is note:
+            return True
+        if isinstance(event, Chord):
+            for n in event.collection:
+                if n is note:
+                    return True
         return False
 
+    def is_first(self, note):
+        """Returns True if the note (or a chord containing it) is the
+        first note or chord this tag applies to."""
+        if self.span_end is None:
+            # Still open, or the events were set explicitly
+            first, last = self.find_first_and_last()
+        else:
+            first = self.first_event
+        return first is not None and self._is_event(first, note)
+
     def is_last(self, note):
-        for i in range(len(self.events)-1, -1, -1):
-            n = self.events[i]
-            if isinstance(n, (Note, Chord)):
-                if isinstance(n, Note):
-                    if n is note:
-                        return True
-                elif isinstance(n, Chord):
-                    if note in n.collection:
-                        return True
-                return False
-        return False
+        """Returns True if the note (or a chord containing it) is the
+        last note or chord this tag applies to."""
+        if self.span_end is None:
+            first, last = self.find_first_and_last()
+        else:
+            last = self.last_event
+        return last is not None and self._is_event(last, note)
 
 class DEFAULT_TAG(TAG):
     pass
@@ -502,6 +938,7 @@ class Segment(INLINE_COLLECTION):
         INLINE_COLLECTION.__init__(self, pos)
 
 class Chord(INLINE_COLLECTION, DURATIONAL):
+    __slots__ = ('_num', '_den', '_dotting')
     separator = ", "
     parens = "{}"
 
@@ -511,11 +948,23 @@ class Chord(INLINE_COLLECTION, DURATIONAL):
             m = max(m, note.get_duration())
         return m
 
+    def get_ticks(self, ticks_per_whole):
+        m = 0
+        for note in self.collection:
+            m = max(m, note.get_ticks(ticks_per_whole))
+        return m
+
     def append(self, item):
+        global _generation
+        _generation += 1
+        # The notes of a chord are covered by the same range tags as
+        # the chord itself
         self.collection.append(item)
         item.parent = self.parent
+        item.index = self.index
 
 class Barline(GUIDO_OBJECT):
+    __slots__ = ()
     measure = None
 
     def __repr__(self):
@@ -25,11 +25,12 @@ Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
 """
 
 from __future__ import generators
-from lexer import Token, Tokenizer, WrongToken
+from lexer import Token, Tokenizer, StreamTokenizer, WrongToken
 
 from pyScore.config import config
 from pyScore.Guido.objects import core
 from pyScore.Guido import tree_builder
+from pyScore.Guido.handler import complete_handler
 
 try:
     import textwrap
@@ -41,10 +42,14 @@ import re
 import sys
 from types import StringType, UnicodeType
 
+# Increase this whenever a change to the parser or the tree builder
+# changes the trees that are built (it invalidates cached trees)
+PARSER_VERSION = 1
+
 ########################################
 # TOKENS
 
-class GuidoTokenizer(Tokenizer):
+class GuidoTokens:
     """This defines the tokens in the GUIDO language.  Since regular
     expressions are used for the matching, complex constructs such as
     the notes and tags can be treated as single 'tokens' with internal
@@ -105,6 +110,16 @@ class GuidoTokenizer(Tokenizer):
         list(Tokenizer.filtered_tokens) +
         [SingleLineComment, MultiLineComment])
 
+    # The arguments to a tag are the only thing that may
+    # span more than one line
+    spanning_delimiters = ("<", ">")
+
+class GuidoTokenizer(GuidoTokens, Tokenizer):
+    pass
+
+class StreamingGuidoTokenizer(GuidoTokens, StreamTokenizer):
+    pass
+
 ########################################
 # PARSING
 
@@ -134,8 +149,8 @@ class GuidoParser:
             self.trace = self._trace_dummy
 
     def _trace_real(self, name, tokens):
-        position = tokens.current_position
-        s = tokens.s[position.pos:min(len(tokens.s), position.pos + 20)]
+        pos = tokens.peek().pos
+        s = tokens.source.s[pos:pos + 20]
         s = s.replace("\n", "")
         s = s.replace("\l", "")
         print name + " " * (20 - len(name)) + ": " + s
@@ -180,7 +195,7 @@ class GuidoParser:
     def SEGMENT(self, tokens, builder):
         self.trace("SEGMENT", tokens)
         tokens.match(tokens.SegmentStart)
-        builder.begin_Segment(tokens.current_position.get_last())
+        builder.begin_Segment(tokens.get_last_position())
         try:
             tokens = self.SEQUENCE(tokens.copy(), builder)
         except WrongToken:
@@ -235,7 +250,7 @@ class GuidoParser:
             note['den'],
             note['dotting'],
             note['octave2'],
-            pos=tokens.current_position.get_last())
+            pos=tokens.get_last_position())
         return tokens
 
     def TAG(self, tokens, builder, inner):
@@ -244,10 +259,10 @@ class GuidoParser:
         tag = tokens.match(tokens.Tag)
 ##         tag_obj = self._tag_factory(
 ##             tag['name'], tag['id'], tag['args'],
-##             pos=tokens.current_position.get_last())
+##             pos=tokens.get_last_position())
         tag_obj = builder.add_Tag(
             tag['name'], tag['id'], tag['args'],
-            pos=tokens.current_position.get_last())
+            pos=tokens.get_last_position())
 
         name = tag_obj.name
         id = tag_obj.id
@@ -286,8 +301,8 @@ class GuidoParser:
         self.trace("CHORD", tokens)
         tokens.match(tokens.ChordStart)
 ##         builder.set_as_collection(core.Chord(
-##             pos=tokens.current_position.get_last()))
-        builder.begin_Chord(pos=tokens.current_position.get_last())
+##             pos=tokens.get_last_position()))
+        builder.begin_Chord(pos=tokens.get_last_position())
         tokens = self.CHORD_VOICE(tokens.copy(), builder)
         while 1:
             try:
@@ -317,8 +332,143 @@ class GuidoParser:
         if not tokens.match(tokens.Barline):
             return 1
 ##         barline = core.Barline(
-##             pos=tokens.current_position.get_last())
+##             pos=tokens.get_last_position())
 ##         builder.add(barline)
-        builder.add_Barline(pos=tokens.current_position.get_last())
+        builder.add_Barline(pos=tokens.get_last_position())
         return tokens
         
+
+class PredictiveGuidoParser(GuidoParser):
+    """A predictive (LL(1)) version of GuidoParser.
+
+    Every production in the GUIDO grammar can be chosen by looking at
+    the next token alone, so rather than trying each alternative on a
+    copy of the tokenizer and catching WrongToken, this parser peeks
+    at the next token and commits to a production.  It makes exactly
+    the same calls on the tree builder as GuidoParser."""
+
+    def FILE(self, tokens, builder):
+        self.trace("FILE", tokens)
+        if tokens.peek_is(tokens.SegmentStart):
+            return self.SEGMENT(tokens, builder)
+        return self.SEQUENCE(tokens, builder)
+    top = FILE
+
+    def SEGMENT(self, tokens, builder):
+        self.trace("SEGMENT", tokens)
+        tokens.match(tokens.SegmentStart)
+        builder.begin_Segment(tokens.get_last_position())
+        if tokens.peek_is(tokens.SequenceStart):
+            tokens = self.SEQUENCE(tokens, builder)
+        while tokens.peek_is(tokens.Comma):
+            tokens.match(tokens.Comma)
+            tokens = self.SEQUENCE(tokens, builder)
+        tokens.match(tokens.SegmentEnd)
+        builder.end_Segment()
+        return tokens
+
+    def VOICE(self, tokens, builder):
+        self.trace("VOICE", tokens)
+        while 1:
+            next = tokens.peek().__class__
+            if next is tokens.Barline:
+                tokens = self.BARLINE(tokens, builder)
+            elif next is tokens.Note:
+                tokens = self.EVENT(tokens, builder)
+            elif next is tokens.ChordStart:
+                tokens = self.CHORD(tokens, builder)
+            elif next is tokens.Tag:
+                tokens = self.TAG(tokens, builder, self.VOICE)
+            else:
+                break
+        return tokens
+
+    def TAG(self, tokens, builder, inner):
+        self.trace("TAG", tokens)
+        tag = tokens.match(tokens.Tag)
+        tag_obj = builder.add_Tag(
+            tag['name'], tag['id'], tag['args'],
+            pos=tokens.get_last_position())
+        if tag_obj.mode != "Begin" and tokens.peek_is(tokens.GroupingStart):
+            tokens = self.TAG_GROUPING(tokens, builder, tag_obj, inner)
+        return tokens
+
+    def TAG_GROUPING(self, tokens, builder, tag_obj, middle):
+        self.trace("TAG_GROUPING", tokens)
+        tokens.match(tokens.GroupingStart)
+        tag_obj.mode = "Begin"
+        tag_obj.use_parens = True
+        builder.add_active_tag(tag_obj)
+        tokens = middle(tokens, builder)
+        tokens.match(tokens.GroupingEnd)
+        builder.remove_active_tag(tag_obj)
+        tag = copy(tag_obj)
+        tag.mode = "End"
+        tag.events = []
+        builder.add(tag)
+        return tokens
+
+    def CHORD(self, tokens, builder):
+        self.trace("CHORD", tokens)
+        tokens.match(tokens.ChordStart)
+        builder.begin_Chord(pos=tokens.get_last_position())
+        tokens = self.CHORD_VOICE(tokens, builder)
+        while tokens.peek_is(tokens.Comma):
+            tokens.match(tokens.Comma)
+            tokens = self.CHORD_VOICE(tokens, builder)
+        tokens.match(tokens.ChordEnd)
+        builder.end_Chord()
+        return tokens
+
+    def CHORD_VOICE(self, tokens, builder):
+        self.trace("CHORD_VOICE", tokens)
+        if tokens.peek_is(tokens.Note):
+            return self.EVENT(tokens, builder)
+        while tokens.peek_is(tokens.Tag):
+            tokens = self.TAG(tokens, builder, self.CHORD_VOICE)
+        return tokens
+
+class StreamingGuidoParser(PredictiveGuidoParser):
+    """A predictive parser that passes the GUIDO events to a handler
+    (see pyScore.Guido.handler) as soon as they are parsed, rather
+    than building a tree of GUIDO objects.  Tag arguments are passed
+    to the handler unparsed.
+
+    The input may be a string, or a file object, which is read a chunk
+    at a time."""
+
+    def __init__(self, tags):
+        PredictiveGuidoParser.__init__(self, tags)
+        self._registered_tags = tree_builder.get_registered_tags(tags)
+
+    def parse(self, input, handler):
+        """Parse the given GUIDO string or file object, passing each
+        event to handler.  Returns the handler."""
+        if type(input) in (StringType, UnicodeType):
+            tokens = GuidoTokenizer(input)
+        else:
+            tokens = StreamingGuidoTokenizer(input)
+        tokens = self.top(tokens, complete_handler(handler))
+        if self._warnings and not tokens.at_end():
+            sys.stderr.write("WARNING: Extra text at end of file\n")
+        return handler
+
+    def TAG(self, tokens, handler, inner):
+        self.trace("TAG", tokens)
+        tag = tokens.match(tokens.Tag)
+        pos = tokens.get_last_position()
+        name, mode = tree_builder.split_tag_name(
+            tag['name'], self._registered_tags)
+        if mode != "Begin" and tokens.peek_is(tokens.GroupingStart):
+            self.trace("TAG_GROUPING", tokens)
+            tokens.match(tokens.GroupingStart)
+            handler.add_Tag(name, tag['id'], tag['args'], pos=pos,
+                            mode="Begin", use_parens=True)
+            tokens = inner(tokens, handler)
+            tokens.match(tokens.GroupingEnd)
+            handler.add_Tag(name, tag['id'], tag['args'],
+                            pos=tokens.get_last_position(),
+                            mode="End", use_parens=True)
+        else:
+            handler.add_Tag(tag['name'], tag['id'], tag['args'], pos=pos)
+        return tokens
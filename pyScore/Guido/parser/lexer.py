@@ -22,6 +22,8 @@ Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
 
 
 from __future__ import generators
+from bisect import bisect_left
+import copy
 import re
 try:
     import textwrap
@@ -33,27 +35,29 @@ except ImportError:
 
 class ParseError:
     def __init__(self, position, message):
-        self.s = position.s
-        self.line = position.line
+        self.source = position.source
         self.position = position.pos
         self.message = message
 
+    def get_line_and_column(self):
+        return self.source.get_line_and_column(self.position)
+
     def __repr__(self):
-        s = self.s
-        i = 0
-        for i in range(max(self.position, 0),
-                       max(self.position - 35, 0), -1):
-            if s[i] in "\n":
-                break
-        start = i
-        for i in range(min(self.position + 1, len(s)),
-                       min(self.position + 35, len(s))):
-            if s[i] in "\n":
-                break
-        end = i + 1
-        result = "\nAt line %d:\n" % self.line
-        result += s[start:end].replace("\n", "")
-        result += "\n" + " " * (self.position - start) + "^\n"
+        s = self.source.s
+        position = self.position
+        line, column = self.get_line_and_column()
+        if s is None:
+            # The text of an unpickled tree is not kept
+            return "\nAt line %d, column %d:\n%s" % (
+                line, column, textwrap.fill(self.message))
+        start = max(position - column + 1, position - 35)
+        end = s.find("\n", position)
+        if end == -1:
+            end = len(s)
+        end = min(end, position + 35)
+        result = "\nAt line %d, column %d:\n" % (line, column)
+        result += s[start:end]
+        result += "\n" + " " * (position - start) + "^\n"
         result += textwrap.fill(self.message)
         return result
 
@@ -68,31 +72,45 @@ class WrongToken(ParseError):
 ########################################
 # TOKENS
 
-class Token:
-    def __init__(self, match_group=None):
-        self.match_group = match_group
-        if match_group != None:
-            self.dict = match_group.groupdict()
-        else:
-            self.dict = {}
+class Token(object):
+    """A token found by the Tokenizer.  Only the values of the groups
+    in the token's own regular expression are kept (not the match
+    object), since there may be a great many tokens in memory at
+    once."""
+    __slots__ = ('values', 'pos', 'end')
+    regex = None
+
+    def __init__(self, values=(), pos=0, end=0):
+        self.values = values
+        self.pos = pos
+        self.end = end
+
+    def get_group_names(cls):
+        """Returns the names of the groups in this token's regular
+        expression, in the order they are stored in 'values'."""
+        if not cls.__dict__.has_key('_group_names'):
+            if cls.regex is None:
+                names = ()
+            else:
+                names = tuple(cls.regex.groupindex.keys())
+            cls._group_names = names
+            cls._group_index = dict([(name, i) for i, name in enumerate(names)])
+        return cls._group_names
+    get_group_names = classmethod(get_group_names)
 
     def __repr__(self):
-        if self.match_group != None:
-            groups = repr(self.dict)
-        else:
-            groups = "None"
-        return "<%s: %s>" % (self.__class__.__name__, groups)
+        names = self.get_group_names()
+        groups = dict([(name, self.values[i]) for i, name in enumerate(names)])
+        return "<%s: %s>" % (self.__class__.__name__, repr(groups))
 
     def __getitem__(self, key):
-        return self.dict[key]
+        return self.values[self._group_index[key]]
 
-    def __setitem__(self, key, val):
-        self.dict[key] = val
-    
     def match(cls, str, pos):
         m = cls.regex.match(str, pos)
         if m:
-            return cls(m)
+            names = cls.get_group_names()
+            return cls(tuple([m.group(name) for name in names]), pos, m.end())
         return None
     match = classmethod(match)
 
@@ -108,77 +126,348 @@ class WhitespaceToken(Token):
 ########################################
 # TOKENIZER
 
-class Position:
-    def __init__(self, s, pos=0, line=1):
+class Source:
+    """The text being parsed.  It is padded once, and then shared by
+    every token and Position that refers to it, so it is never copied.
+    Line and column numbers are only needed to report errors, so the
+    index of newlines is not built until they are asked for."""
+    def __init__(self, s, line=1):
         self.s = s + "  \n"
-        self.pos = pos
-        self.last_pos = pos
+        self.length = len(s)
         self.line = line
-        self.last_line = line
+        self._newlines = None
+
+    def get_line_and_column(self, pos):
+        newlines = self._newlines
+        if newlines is None:
+            newlines = self._newlines = []
+            s = self.s
+            i = s.find("\n")
+            while i != -1:
+                newlines.append(i)
+                i = s.find("\n", i + 1)
+        line = bisect_left(newlines, pos)
+        if line:
+            start = newlines[line - 1] + 1
+        else:
+            start = 0
+        return self.line + line, pos - start + 1
+
+    def __getstate__(self):
+        # Positions are pickled with the trees they are part of (see
+        # pyScore.Guido.tree_cache).  Only what is needed for line and
+        # column numbers is kept, not the text itself.
+        self.get_line_and_column(0)
+        return {'line': self.line, 'length': self.length,
+                '_newlines': self._newlines}
 
-    def update_max(self, pos):
-        self.pos = max(self.pos, pos.pos)
-        self.line = max(self.line, pos.line)
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.s = None
+
+class Position(object):
+    """An offset into a Source."""
+    __slots__ = ('source', 'pos')
+
+    def __init__(self, source, pos=0):
+        self.source = source
+        self.pos = pos
 
-    def get_last(self):
-        return Position(self.s, self.last_pos, self.last_line)
+    def _get_line(self):
+        return self.source.get_line_and_column(self.pos)[0]
+    line = property(_get_line)
 
 class Tokenizer:
+    """A tokenizer scans the entire input string once, up front, into a
+    flat list of tokens.  All of the token classes (both those in
+    'tokens' and 'filtered_tokens') are joined into a single
+    alternation of named groups, so each token is found with a single
+    regular expression match.  Filtered tokens are discarded during
+    the scan.
+
+    The parser then consumes the tokens by index.  'copy' is cheap,
+    since all copies share the same list of tokens."""
+    tokens = ()
     filtered_tokens = (WhitespaceToken,)
-    def __init__(self, s, pos = 0, line = 1, deepest = None):
-        self.current_position = Position(s, pos, line)
-        if deepest == None:
-            self.deepest_position = Position(s, pos, line)
-        else:
-            self.deepest_position = deepest
-            deepest.update_max(self.current_position)
+
+    def __init__(self, s, stream=None, index=0, deepest=None):
+        if not isinstance(s, Source):
+            s = Source(s)
+        self.source = s
+        if stream is None:
+            stream = self.scan(s)
+        self.stream = stream
+        self.index = index
+        if deepest is None:
+            deepest = [index]
+        self.deepest = deepest
+
+    def get_master_regex(cls):
+        """Returns the compiled alternation of all tokens for this
+        tokenizer class, and a dictionary from group names to token
+        classes and the names of their subgroups (None for filtered
+        tokens).  This is built once per class."""
+        if not cls.__dict__.has_key('_master_regex'):
+            alternatives = []
+            groups = {}
+            for tok in cls.filtered_tokens:
+                name = "_filtered_" + tok.__name__
+                alternatives.append("(?P<%s>%s)" % (name, tok.regex.pattern))
+                groups[name] = None
+            for tok in cls.tokens:
+                name = "_token_" + tok.__name__
+                alternatives.append("(?P<%s>%s)" % (name, tok.regex.pattern))
+                groups[name] = (tok, tok.get_group_names())
+            cls._master_regex = re.compile("|".join(alternatives))
+            cls._master_groups = groups
+        return cls._master_regex, cls._master_groups
+    get_master_regex = classmethod(get_master_regex)
+
+    def scan(self, source):
+        """Splits the source into a list of tokens in a single
+        left-to-right pass.  Scanning stops at the first character
+        that does not begin any token, and the list is always
+        terminated by an EndOfFileToken, so parse errors are
+        reported by the parser, not the scanner."""
+        stream, pos = self._scan(source)
+        stream.append(EndOfFileToken((), pos, pos))
+        return stream
+
+    def _scan(self, source):
+        """Returns the list of tokens in the source, and the offset
+        at which scanning stopped."""
+        regex, groups = self.get_master_regex()
+        match = regex.match
+        stream = []
+        append = stream.append
+        s = source.s
+        pos = 0
+        length = source.length
+        while pos < length:
+            m = match(s, pos)
+            if m is None:
+                break
+            end = m.end()
+            group = groups[m.lastgroup]
+            if group is not None:
+                tok, names = group
+                if len(names) > 1:
+                    append(tok(m.group(*names), pos, end))
+                elif names:
+                    append(tok((m.group(names[0]),), pos, end))
+                else:
+                    append(tok((), pos, end))
+            pos = end
+        return stream, pos
 
     def copy(self):
-        position = self.current_position
-        return self.__class__(position.s, position.pos, position.line, self.deepest_position)
+        return self.__class__(self.source, self.stream, self.index, self.deepest)
 
     def match(self, token):
-        position = self.current_position
-        position.last_pos = position.pos
-        position.last_line = position.line
-        if position.pos > len(position.s):
-            return None
-        found_whitespace = True
-        filtered_tokens = self.filtered_tokens
-        while found_whitespace:
-            found_whitespace = False
-            for tok in filtered_tokens:
-                match = tok.match(position.s, position.pos)
-                if match != None:
-                    end = match.match_group.end()
-                    position.line += position.s.count('\n', position.pos, end)
-                    position.pos = end
-                    found_whitespace = True
-                    break
-        match = token.match(position.s, position.pos)
-        if match != None:
-            end = match.match_group.end()
-            position.line += position.s.count('\n', position.pos, end)
-            position.pos = end
-            self.deepest_position.update_max(position)
-            return match
-        self.deepest_position.update_max(position)
+        index = self.index
+        if index > self.deepest[0]:
+            self.deepest[0] = index
+        found = self.stream[index]
+        if found.__class__ is token:
+            self.index = index + 1
+            return found
         self.raise_error_wrong_token(token)
 
+    def peek(self):
+        return self.stream[self.index]
+
+    def peek_is(self, token):
+        """Returns True if the next token is of the given class,
+        without consuming it."""
+        return self.stream[self.index].__class__ is token
+
+    def get_position(self, index):
+        return Position(self.source, self.stream[index].pos)
+
+    def get_last_position(self):
+        """Returns the position of the most recently matched token."""
+        return self.get_position(max(self.index - 1, 0))
+
     def raise_error(self, message):
-        raise ParseError(self.s, self.pos, self.line, message)
+        raise ParseError(self.get_last_position(), message)
 
     def raise_error_wrong_token(self, expected):
-        position = self.deepest_position
-        found = None
-        for tok in self.tokens:
-            if tok.match(position.s, position.pos):
-                found = tok.__name__
+        index = self.deepest[0]
+        found = self.stream[index]
+        if isinstance(found, EndOfFileToken):
+            found = "<unknown>"
+        else:
+            found = found.__class__.__name__
+        raise WrongToken(self.get_position(index), found)
+
+    def at_end(self):
+        if self.index:
+            pos = self.stream[self.index - 1].end
+        else:
+            pos = 0
+        return not len(self.source.s[pos:].strip())
+
+class EndOfChunkToken(Token):
+    pass
+
+class Chunk(object):
+    """A chunk of the input of a StreamTokenizer, and its tokens.
+    Each chunk refers to the one after it once that has been read, but
+    never to the ones before, so a chunk is freed as soon as no
+    tokenizer refers to it."""
+    __slots__ = ('source', 'stream', 'offset', 'previous', 'next')
+
+    def __init__(self, source, stream, offset, previous):
+        self.source = source
+        self.stream = stream
+        # The number of tokens in the chunks before this one
+        self.offset = offset
+        # The Position of the last token before this chunk, if any
+        self.previous = previous
+        self.next = None
+
+class ChunkReader:
+    """The input of a StreamTokenizer, shared by all of its copies."""
+    def __init__(self, fd, chunk_size):
+        self.fd = fd
+        self.chunk_size = chunk_size
+        self.pending = ""
+        self.line = 1
+        self.done = False
+        self.stopped = False
+
+class StreamTokenizer(Tokenizer):
+    """A Tokenizer that reads its input from a file object a chunk at
+    a time, so that only the chunks still in use and their tokens are
+    held in memory, no matter how large the input is.
+
+    Chunks are always cut just after a newline, which no token can
+    span, unless the newline falls between a pair of
+    'spanning_delimiters' (such as the '<...>' arguments of a GUIDO
+    tag).
+
+    Copies share the chunks that have been read, and a chunk is kept
+    only as long as some copy has not moved past it.  A parser that
+    never backtracks (such as StreamingGuidoParser) holds one chunk at
+    a time; a backtracking one holds the chunks from its oldest copy
+    on."""
+    chunk_size = 1 << 16
+    spanning_delimiters = None
+
+    def __init__(self, fd, chunk_size=None):
+        if chunk_size is None:
+            chunk_size = self.chunk_size
+        self._reader = ChunkReader(fd, chunk_size)
+        # The furthest any copy has got: (token number, chunk, index)
+        self.deepest = [-1, None, 0]
+        self._set_chunk(self._read_chunk(None))
+
+    def copy(self):
+        # The reader, the chunks and 'deepest' are shared
+        return copy.copy(self)
+
+    def find_chunk_end(self, s):
+        """Returns the offset just after the last newline in s that a
+        token can not span, or 0 if there is no such newline."""
+        end = s.rfind("\n") + 1
+        if self.spanning_delimiters is None:
+            return end
+        start, stop = self.spanning_delimiters
+        while end:
+            open = s.rfind(start, 0, end)
+            if open == -1 or s.find(stop, open, end) != -1:
+                break
+            end = s.rfind("\n", 0, open) + 1
+        return end
+
+    def _read_chunk(self, last):
+        """Reads and scans the chunk after 'last' (None for the
+        first)."""
+        reader = self._reader
+        pending = reader.pending
+        while 1:
+            data = reader.fd.read(reader.chunk_size)
+            if not data:
+                reader.done = True
+                end = len(pending)
                 break
-        if found == None:
+            pending += data
+            end = self.find_chunk_end(pending)
+            if end:
+                break
+        text = pending[:end]
+        reader.pending = pending[end:]
+        source = Source(text, reader.line)
+        reader.line += text.count("\n")
+        stream, pos = self._scan(source)
+        if pos < source.length:
+            reader.done = reader.stopped = True
+            reader.pending = ""
+        if reader.done:
+            stream.append(EndOfFileToken((), pos, pos))
+        else:
+            stream.append(EndOfChunkToken((), pos, pos))
+        if last is None:
+            return Chunk(source, stream, 0, None)
+        # The last token of a chunk is always its EndOfChunkToken
+        if len(last.stream) > 1:
+            previous = Position(last.source, last.stream[-2].pos)
+        else:
+            previous = last.previous
+        return Chunk(source, stream, last.offset + len(last.stream) - 1, previous)
+
+    def _set_chunk(self, chunk):
+        self._chunk = chunk
+        self.source = chunk.source
+        self.stream = chunk.stream
+        self.index = 0
+
+    def _next_chunk(self):
+        chunk = self._chunk
+        if chunk.next is None:
+            chunk.next = self._read_chunk(chunk)
+        self._set_chunk(chunk.next)
+
+    def peek(self):
+        found = self.stream[self.index]
+        while found.__class__ is EndOfChunkToken:
+            self._next_chunk()
+            found = self.stream[self.index]
+        return found
+
+    def peek_is(self, token):
+        return self.peek().__class__ is token
+
+    def match(self, token):
+        found = self.peek()
+        if found.__class__ is token:
+            self.index += 1
+            return found
+        # Only failures are recorded, which keeps matching fast; the
+        # error is reported where the furthest copy failed
+        number = self._chunk.offset + self.index
+        if number > self.deepest[0]:
+            self.deepest[:] = [number, self._chunk, self.index]
+        self.raise_error_wrong_token(token)
+
+    def raise_error_wrong_token(self, expected):
+        number, chunk, index = self.deepest
+        found = chunk.stream[index]
+        position = Position(chunk.source, found.pos)
+        if isinstance(found, EndOfFileToken):
             found = "<unknown>"
-        raise WrongToken(self.deepest_position, found)
+        else:
+            found = found.__class__.__name__
+        raise WrongToken(position, found)
+
+    def get_last_position(self):
+        if self.index:
+            return self.get_position(self.index - 1)
+        if self._chunk.previous is not None:
+            return self._chunk.previous
+        return self.get_position(0)
 
     def at_end(self):
-        position = self.current_position
-        return not len(position.s[position.pos:].strip())
+        """Returns True if there is nothing but filtered tokens (such as
+        whitespace and comments) left in the input."""
+        return self.peek_is(EndOfFileToken) and not self._reader.stopped
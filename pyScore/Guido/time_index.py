@@ -0,0 +1,154 @@
+"""
+Time-indexed queries over a GUIDO tree
+Python GUIDO tools
+
+Copyright (c) 2002-2008 Michael Droettboom
+"""
+## This program is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License
+## as published by the Free Software Foundation; either version 2
+## of the License, or (at your option) any later version.
+
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+
+## You should have received a copy of the GNU General Public License
+## along with this program; if not, write to the Free Software
+## Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+
+from pyScore.Guido.objects import core
+
+from bisect import bisect_left, bisect_right
+
+class TimeIndex:
+   """Answers questions about what happens when in a GUIDO Score,
+   without walking the tree.
+
+   Times are given in whole notes, as Rats or integers (the same units
+   as the time_spine of each object).  Voices are numbered from 0, in
+   the order of the sequences in the score, and measures from 1.
+
+   The events of a voice (notes, rests and chords) follow each other,
+   so each voice keeps their onsets and ends in two sorted lists, and
+   every query is a binary search in them.  Looking up a time is
+   O(log n) in each voice; getting a range of events is O(log n + k)
+   for k events.
+
+   The index is a snapshot: it does not see changes made to the score
+   after it was built (see Score.get_time_index)."""
+
+   def __init__(self, score):
+      assert isinstance(score, core.Score)
+      self.time_base = score.calc_time_spines()
+      self.ticks_per_whole = self.time_base.ticks_per_whole
+      # One (events, onsets, ends) per voice
+      self._voices = []
+      barlines = {}
+      end = 0
+      for sequence in score.toplevel.collection:
+         events = []
+         onsets = []
+         ends = []
+         for item in sequence.collection:
+            if isinstance(item, core.Barline):
+               barlines[item.ticks] = None
+            elif isinstance(item, (core.EVENT, core.Chord)):
+               events.append(item)
+               onsets.append(item.ticks)
+               ends.append(item.ticks + item.get_ticks(self.ticks_per_whole))
+         self._voices.append((events, onsets, ends))
+         if len(ends):
+            end = max(end, ends[-1])
+      self.end = end
+      # Barlines are global in GUIDO, so the measures are those of all
+      # of the voices together.  A barline at the very beginning or end
+      # of the score does not start a new measure.
+      barlines = [x for x in barlines.keys() if x > 0 and x < end]
+      barlines.sort()
+      self._barlines = barlines
+
+   def _to_ticks(self, time):
+      """Returns time as a (floor, ceiling) pair of ticks."""
+      if isinstance(time, (int, long)):
+         ticks = time * self.ticks_per_whole
+         return ticks, ticks
+      num = time.num * self.ticks_per_whole
+      floor = num // time.den
+      if num % time.den:
+         return floor, floor + 1
+      return floor, floor
+
+   def __len__(self):
+      """Returns the number of voices."""
+      return len(self._voices)
+
+   def get_measure_count(self):
+      return len(self._barlines) + 1
+
+   def get_end(self):
+      """Returns the end of the score."""
+      return self.time_base.to_rat(self.end)
+
+   def get_events_at(self, time, voice=None):
+      """Returns the events (notes, rests and chords) sounding at time,
+      in the given voice or, if voice is None, in every voice."""
+      ticks = self._to_ticks(time)[0]
+      if voice is None:
+         voices = self._voices
+      else:
+         voices = [self._voices[voice]]
+      result = []
+      for events, onsets, ends in voices:
+         # The last event to start at or before time, unless it has
+         # already ended
+         i = bisect_right(onsets, ticks) - 1
+         if i >= 0 and ends[i] > ticks:
+            result.append(events[i])
+      return result
+
+   def get_notes_at(self, time, voice=None):
+      """Returns the notes sounding at time, in the given voice or, if
+      voice is None, in every voice.  The notes of a chord may be
+      shorter than the chord itself, so each is checked on its own."""
+      ticks = self._to_ticks(time)[0]
+      ticks_per_whole = self.ticks_per_whole
+      result = []
+      for event in self.get_events_at(time, voice):
+         if isinstance(event, core.Chord):
+            for note in event.collection:
+               if (isinstance(note, core.Note) and
+                   note.ticks + note.get_ticks(ticks_per_whole) > ticks):
+                  result.append(note)
+         elif isinstance(event, core.Note):
+            result.append(event)
+      return result
+
+   def get_events_between(self, start, end, voice):
+      """Returns the events of the given voice that sound at some time
+      in [start, end), in order."""
+      events, onsets, ends = self._voices[voice]
+      first = bisect_right(ends, self._to_ticks(start)[0])
+      last = bisect_left(onsets, self._to_ticks(end)[1])
+      return events[first:last]
+
+   def get_measure_at(self, time):
+      """Returns the number of the measure containing time."""
+      return bisect_right(self._barlines, self._to_ticks(time)[0]) + 1
+
+   def get_measure_bounds(self, measure):
+      """Returns the start and end of the given measure."""
+      if measure < 1 or measure > len(self._barlines) + 1:
+         raise IndexError("There is no measure %d in the score." % measure)
+      if measure == 1:
+         start = 0
+      else:
+         start = self._barlines[measure - 2]
+      if measure > len(self._barlines):
+         end = self.end
+      else:
+         end = self._barlines[measure - 1]
+      return self.time_base.to_rat(start), self.time_base.to_rat(end)
+
+__all__ = ["TimeIndex"]
@@ -45,6 +45,7 @@ regex_event = re.compile(
 regex_tag_name = re.compile("[A-Za-z_][A-Za-z0-9_]*")
 _arg_str = '(?P<arg>(?:(?P<key>[A-Za-z_][A-Za-z0-9_]*)=)?(?:")?(?P<value>[^"]*)(?:")?)'
 regex_arg = re.compile(_arg_str)
+regex_space = re.compile(r"\s*", re.UNICODE)
 regex_tag = re.compile(
     r'\\(?P<name>[A-Za-z_][A-Za-z0-9_]*)(:(?P<id>[0-9]+))?(?:\<(?P<args>[^>]*)\>)?'
     )
@@ -56,6 +57,133 @@ default_note = {'pitch_name': 'c',
                 'den': 4,
                 'dotting': ''}
 
+class TagRegistry(dict):
+   """A read-only dictionary from tag names to TAG classes.  It also
+   resolves tag names as they are written in GUIDO into a base name
+   and a mode, so that 'slurBegin' becomes ('slur', 'Begin'), from a
+   table of the Begin and End forms of the registered names."""
+   # The most names not in the table whose modes are remembered
+   max_unknown_names = 4096
+
+   def __init__(self, tags):
+      dict.__init__(self, tags)
+      # tag name -> mode suffix
+      modes = {}
+      for name in tags.keys():
+         modes[name] = ""
+         for mode in ("Begin", "End"):
+            if not tags.has_key(name + mode):
+               modes[name + mode] = mode
+      self._modes = modes
+      self._num_known_names = len(modes)
+
+   def _read_only(self, *args, **kwargs):
+      raise TypeError("Tag registries are shared, and can not be changed.")
+   __setitem__ = __delitem__ = setdefault = update = _read_only
+   pop = popitem = clear = _read_only
+
+   def split_name(self, name):
+      """Splits a tag name into its base name and its mode.  Names of
+      registered tags (such as 'repeatBegin') are never split."""
+      mode = self._modes.get(name)
+      if mode is None:
+         mode = ""
+         if not self.has_key(name):
+            if name.endswith("Begin"):
+               mode = "Begin"
+            elif name.endswith("End"):
+               mode = "End"
+         if len(self._modes) < self._num_known_names + self.max_unknown_names:
+            self._modes[name] = mode
+      if mode:
+         return name[:-len(mode)], mode
+      return name, ""
+
+# (id of each tag module) -> TagRegistry
+_tag_registries = {}
+
+def get_registered_tags(tags):
+   """Returns a TagRegistry of the TAG classes in the given module(s)
+   or dictionaries.  The registry for a given list of modules is built
+   once and shared by everything in the process that uses them."""
+   if type(tags) not in (ListType, TupleType):
+      tags = [tags]
+   key = None
+   if len([t for t in tags if type(t) == ModuleType]) == len(tags):
+      key = tuple([id(t) for t in tags])
+      registry = _tag_registries.get(key)
+      if registry is not None:
+         return registry
+   registered_tags = {}
+   for t in tags:
+      if not type(t) == DictType:
+         t = t.__dict__
+      for tag_name, val in t.items():
+         if (isclass(val) and
+             issubclass(val, core.TAG)):
+            registered_tags[tag_name] = val
+   registry = TagRegistry(registered_tags)
+   if key is not None:
+      _tag_registries[key] = registry
+   return registry
+
+def split_tag_name(name, registered_tags):
+   """Splits a tag name into its base name and its mode, so that
+   'slurBegin' becomes ('slur', 'Begin').  Names of registered tags
+   (such as 'repeatBegin') are never split."""
+   if isinstance(registered_tags, TagRegistry):
+      return registered_tags.split_name(name)
+   if not registered_tags.has_key(name):
+      if name.endswith("Begin"):
+         return name[:-5], "Begin"
+      elif name.endswith("End"):
+         return name[:-3], "End"
+   return name, ""
+
+# Argument strings no longer than this are memoized by parse_tag_args,
+# up to _max_tag_args_cache of them
+_max_cached_tag_args = 64
+_max_tag_args_cache = 4096
+_tag_args_cache = {}
+
+def parse_tag_args(args, name=""):
+   """Parses the argument string of a tag, such as
+   '"4/4"' or 'name="Allegro", dy=2', into a list of the positional
+   arguments and a dictionary of the keyword arguments.  The string is
+   scanned once, without slicing it.  The results for short strings,
+   which are often repeated (as in \\meter, \\key and \\clef), are
+   memoized; a new list and dictionary are returned each time."""
+   key = (args.__class__, args)
+   cached = _tag_args_cache.get(key)
+   if cached is not None:
+      return list(cached[0]), dict(cached[1])
+   args_list = []
+   args_dict = {}
+   pos = 0
+   end = len(args)
+   first = True
+   while pos < end:
+      if not first:
+         if args[pos] != ",":
+            raise ValueError("Couldn't parse arguments to tag '%s'" % name)
+         pos = regex_space.match(args, pos + 1, end).end()
+      match = regex_arg.match(args, pos, end)
+      if match.group('key') != None:
+         args_dict[match.group('key')] = match.group('value')
+      else:
+         args_list.append(match.group('value'))
+      if first:
+         # The first argument may have trailing whitespace, but
+         # whitespace is ignored between and after the others
+         end = len(args.rstrip())
+         first = False
+      pos = match.end('arg')
+      if pos < end:
+         pos = regex_space.match(args, pos, end).end()
+   if len(args) <= _max_cached_tag_args and len(_tag_args_cache) < _max_tag_args_cache:
+      _tag_args_cache[key] = (tuple(args_list), args_dict.items())
+   return args_list, args_dict
+
 class GuidoTreeBuilder:
    # high-level interface
 
@@ -66,19 +194,18 @@ class GuidoTreeBuilder:
       self._last_event = self.get_Event(**default_note)
       self._last_octave = default_note['octave']
       self.unknown_tags = {}
+      # (tag class, name, id, arguments) -> the first such tag
+      self._shared_tags = {}
       if type(tags) not in (ListType, TupleType):
          tags = [tags]
-      self._registered_tags = {}
-      for t in tags:
-         self.register_module_of_tags(t)
+      self._tag_modules = list(tags)
+      self._registered_tags = get_registered_tags(self._tag_modules)
 
    def register_module_of_tags(self, t):
-      if not type(t) == DictType:
-         t = t.__dict__
-      for key, val in t.items():
-         if (isclass(val) and
-             issubclass(val, core.TAG)):
-            self._registered_tags[key] = val
+      if type(t) not in (ListType, TupleType):
+         t = [t]
+      self._tag_modules.extend(t)
+      self._registered_tags = get_registered_tags(self._tag_modules)
 
    def begin_Segment(self, pos=None):
       self.set_as_collection(core.Segment(pos=pos))
@@ -97,6 +224,7 @@ class GuidoTreeBuilder:
          self.reset_collection()
       for i in range(len(self._active_tags) - 1, -1, -1):
          tag = self._active_tags[i]
+         tag.parent.end_tag_span(tag)
          new_tag = copy(tag)
          new_tag.mode = "End"
          new_tag.events = []
@@ -131,16 +259,28 @@ class GuidoTreeBuilder:
       self.add(empty)
 
    def add_Event_to_Chord(self, *args, **kwargs):
+      """Adds a note to a chord with the previous event, turning the
+      previous event into a chord if it isn't in one already."""
       note = self.get_Event(*args, **kwargs)
       if not isinstance(self.current_collection, core.Chord):
          chord = core.Chord()
-         self.current_collection.collection[
-            self.current_collection.collection.index(self._last_event)] = chord
-         chord.collection.append(self._last_event)
+         collection = self.current_collection.collection
+         # The last event knows where it is in its collection
+         index = self._last_event.index
+         if (index is None or index >= len(collection) or
+             collection[index] is not self._last_event):
+            # Not in the current collection (as at the start of a
+            # sequence), so let list.index raise the usual ValueError
+            index = collection.index(self._last_event)
+         collection[index] = chord
+         chord.parent = self.current_collection
+         chord.index = index
+         chord.append(self._last_event)
          self._stack.append(self.current_collection)
          self.current_collection = chord
       self.add(note)
       self._last_event = note
+      return note
 
    def add_Event_not_in_Chord(self, *args, **kwargs):
       note = self.get_Event(*args, **kwargs)
@@ -148,6 +288,7 @@ class GuidoTreeBuilder:
          self.reset_collection()
       self.add(note)
       self._last_event = note
+      return note
 
    def begin_Chord(self, pos=None):
       self.set_as_collection(core.Chord(pos=pos))
@@ -163,12 +304,9 @@ class GuidoTreeBuilder:
    # low-level interface
 
    def add(self, obj):
-      """Adds an object to the current part."""
+      """Adds an object to the current part.  The active tags cover
+      it through their spans in the collection (see add_active_tag)."""
       self.current_collection.append(obj)
-      for tag in self._active_tags:
-         obj.tags.setdefault(tag.__class__.__name__, []).append(tag)
-         if not isinstance(self.current_collection, core.Chord):
-            tag.events.append(obj)
 
    def set_as_collection(self, collection, add=True):
       """Makes the collection the current one"""
@@ -185,7 +323,14 @@ class GuidoTreeBuilder:
       self.current_collection = self._stack[-1]
 
    def add_active_tag(self, tag_obj):
+      """Starts a range tag, which covers everything added to the
+      current part until remove_active_tag is called.  Tags that start
+      within a chord cover the chord as a whole."""
       assert isinstance(tag_obj, core.TAG)
+      collection = self.current_collection
+      if isinstance(collection, core.Chord):
+         collection = collection.parent
+      collection.begin_tag_span(tag_obj)
       self._active_tags.append(tag_obj)
 
    def remove_active_tag(self, tag_obj):
@@ -195,6 +340,7 @@ class GuidoTreeBuilder:
          if (active_tags[i].name == tag_obj.name and
              active_tags[i].id == tag_obj.id):
             assert active_tags[i].mode == "Begin"
+            active_tags[i].parent.end_tag_span(active_tags[i])
             del active_tags[i]
             return
       tag_obj.raise_error(
@@ -271,6 +417,32 @@ class GuidoTreeBuilder:
          except ValueError:
             raise ValueError("'%s' is an invalid tag id number." % id)
 
+      base_name, split_mode = self._registered_tags.split_name(name)
+      if split_mode:
+         mode = split_mode
+      if self._registered_tags.has_key(base_name):
+         tag_cls = self._registered_tags[base_name]
+      else:
+         tag_cls = self._registered_tags['DEFAULT_TAG']
+         self.unknown_tags[base_name] = None
+
+      # Identical occurrences of a tag share their arguments and
+      # whatever the tag class worked out from them
+      key = None
+      if (tag_cls.shareable and type(args) in (StringType, UnicodeType, TupleType) and
+          len(args) <= _max_cached_tag_args):
+         key = (tag_cls, base_name, id, args)
+         try:
+            shared = self._shared_tags.get(key)
+         except TypeError:
+            # Unhashable arguments
+            shared = key = None
+         if shared is not None:
+            tag = shared.new_occurrence(pos)
+            tag.mode = mode
+            tag.use_parens = use_parens
+            return tag
+
       args_list = []
       args_dict = {}
       if type(args) in (TupleType, ListType):
@@ -278,40 +450,11 @@ class GuidoTreeBuilder:
       elif type(args) == type({}):
          args_dict = args
       elif type(args) in (StringType, UnicodeType):
-         first = True
-         while len(args):
-            if not first:
-               if args.startswith(","):
-                  args = args[1:].strip()
-               else:
-                  raise ValueError("Couldn't parse arguments to tag '%s'" % name)
-            first = False
-            match = regex_arg.match(args)
-            if match == None:
-               raise ValueError("'%s' is an invalid argument to tag '%s'." %
-                                (arg, name))
-            match_dict = match.groupdict()
-            if match_dict['key'] != None:
-               args_dict[match_dict['key']] = match_dict['value']
-            else:
-               args_list.append(match_dict['value'])
-            args = args[match.end("arg"):].strip()
+         args_list, args_dict = parse_tag_args(args, name)
 
-      if self._registered_tags.has_key(name):
-         tag_cls = self._registered_tags[name]
-      else:
-         if name.endswith("Begin"):
-            name = name[:-5]
-            mode = "Begin"
-         elif name.endswith("End"):
-            name = name[:-3]
-            mode = "End"
-         if self._registered_tags.has_key(name):
-            tag_cls = self._registered_tags[name]
-         else:
-            tag_cls = self._registered_tags['DEFAULT_TAG']
-            self.unknown_tags[name] = None
-      tag = tag_cls(name, id, args_list, args_dict, pos=pos)
+      tag = tag_cls(base_name, id, args_list, args_dict, pos=pos)
+      if key is not None:
+         self._shared_tags[key] = tag
       tag.mode = mode
       tag.use_parens = use_parens
       return tag
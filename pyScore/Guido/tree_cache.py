@@ -0,0 +1,205 @@
+"""
+An on-disk cache of parsed GUIDO trees
+Python GUIDO tools
+
+Copyright (c) 2002-2008 Michael Droettboom
+"""
+## This program is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License
+## as published by the Free Software Foundation; either version 2
+## of the License, or (at your option) any later version.
+
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+
+## You should have received a copy of the GNU General Public License
+## along with this program; if not, write to the Free Software
+## Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+
+from pyScore.Guido.parser.guido_parser import PARSER_VERSION
+from pyScore.Guido import tree_builder
+from pyScore.__version__ import version
+
+import cPickle
+import os
+from os.path import join, isdir, expanduser
+from types import UnicodeType
+import zlib
+try:
+   from hashlib import sha1
+except ImportError:
+   from sha import new as sha1
+
+# Increase this whenever the format of the cache files changes
+CACHE_VERSION = 5
+
+class TreeCache:
+   """Stores GUIDO trees, pickled and compressed, in a directory, keyed
+   on a hash of the GUIDO text, the registered tags and the parser
+   version.  When the files in the directory add up to more than
+   max_size bytes, the least recently used ones are removed.
+
+   The size of the directory is found once, and then kept up to date
+   as trees are added and removed, so the directory is only listed
+   again when the cache seems to be full.  (Other processes may be
+   adding to the same directory, so listing it finds the real
+   size.)"""
+   extension = ".tree"
+
+   def __init__(self, directory, max_size):
+      self.directory = expanduser(directory)
+      self.max_size = max_size
+      self._tag_signatures = {}
+      self._size = None
+      # The number of trees found and not found by get
+      self.hits = 0
+      self.misses = 0
+      if not isdir(self.directory):
+         os.makedirs(self.directory)
+
+   def get_tag_signature(self, tags):
+      """Returns a string that changes whenever the set of tag classes
+      in the given module(s) changes."""
+      if type(tags) not in (list, tuple):
+         tags = [tags]
+      key = tuple([id(x) for x in tags])
+      signature = self._tag_signatures.get(key)
+      if signature is None:
+         names = ["%s=%s.%s" % (name, cls.__module__, cls.__name__)
+                  for name, cls in tree_builder.get_registered_tags(tags).items()]
+         names.sort()
+         signature = self._tag_signatures[key] = " ".join(names)
+      return signature
+
+   def get_key(self, s, tags):
+      """Returns the key under which the tree for the GUIDO string s,
+      parsed with the given tag module(s), is stored."""
+      if type(s) == UnicodeType:
+         s = s.encode("utf8")
+      digest = sha1("%d %s %d\n" % (CACHE_VERSION, version, PARSER_VERSION))
+      digest.update(self.get_tag_signature(tags))
+      digest.update("\n")
+      digest.update(s)
+      return digest.hexdigest()
+
+   def get_filename(self, key):
+      return join(self.directory, key + self.extension)
+
+   def get(self, key):
+      """Returns the tree stored under the given key, or None if
+      there isn't one."""
+      filename = self.get_filename(key)
+      try:
+         fd = open(filename, "rb")
+         try:
+            data = fd.read()
+         finally:
+            fd.close()
+      except IOError:
+         self.misses += 1
+         return None
+      try:
+         score = cPickle.loads(zlib.decompress(data))
+      except Exception:
+         # A corrupt or partially written file: just throw it away
+         self.remove(filename)
+         self.misses += 1
+         return None
+      self.hits += 1
+      try:
+         # Mark it as recently used
+         os.utime(filename, None)
+      except OSError:
+         pass
+      return score
+
+   def put(self, key, score):
+      """Stores a tree under the given key, and then removes the least
+      recently used trees if the cache is too large."""
+      try:
+         data = zlib.compress(cPickle.dumps(score, cPickle.HIGHEST_PROTOCOL))
+      except (cPickle.PicklingError, TypeError, RuntimeError):
+         # Some objects (such as those from C extensions) may not be
+         # picklable, and very deep trees may exceed the recursion
+         # limit, in which case the tree just isn't cached
+         return
+      filename = self.get_filename(key)
+      try:
+         replaced = os.stat(filename).st_size
+      except OSError:
+         replaced = 0
+      # Write to a temporary file and rename it, so other processes
+      # never see a partially written tree
+      tmp_filename = "%s.%d.tmp" % (filename, os.getpid())
+      try:
+         fd = open(tmp_filename, "wb")
+         try:
+            fd.write(data)
+         finally:
+            fd.close()
+         try:
+            os.rename(tmp_filename, filename)
+         except OSError:
+            # On Windows, rename won't replace an existing file
+            self.remove(tmp_filename)
+            return
+      except IOError:
+         self.remove(tmp_filename)
+         return
+      if self._size is None:
+         self._size = self.get_size()
+      else:
+         self._size += len(data) - replaced
+      if self._size > self.max_size:
+         self.evict()
+
+   def list(self):
+      """Returns the (modification time, size, filename) of each tree
+      in the cache."""
+      entries = []
+      for name in os.listdir(self.directory):
+         if not name.endswith(self.extension):
+            continue
+         filename = join(self.directory, name)
+         try:
+            stat = os.stat(filename)
+         except OSError:
+            continue
+         entries.append((stat.st_mtime, stat.st_size, filename))
+      return entries
+
+   def get_size(self, entries=None):
+      """Returns the total size of the trees in the cache, or of the
+      given entries from list."""
+      if entries is None:
+         entries = self.list()
+      total = 0
+      for mtime, size, filename in entries:
+         total += size
+      return total
+
+   def evict(self):
+      """Removes the least recently used trees until the cache is no
+      larger than max_size."""
+      entries = self.list()
+      total = self.get_size(entries)
+      entries.sort()
+      for mtime, size, filename in entries:
+         if total <= self.max_size:
+            break
+         self.remove(filename)
+         total -= size
+      self._size = total
+
+   def remove(self, filename):
+      try:
+         size = os.stat(filename).st_size
+         os.remove(filename)
+      except OSError:
+         return
+      if self._size is not None and filename.endswith(self.extension):
+         self._size -= size
+
+__all__ = ["TreeCache"]
@@ -24,6 +24,8 @@ from pyScore.MIDI.conversion_constants import *
 from pyScore.MIDI.midi_codes import *
 from pyScore.util.range_checking import *
 
+from types import StringType, UnicodeType
+
 
 from math import log
 try:
@@ -36,6 +38,8 @@ config.add_option("", "--ticks-per-beat", type="int", default=TICKS_PER_BEAT,
                   help="[midi] The number of MIDI ticks per quarter note when outputting MidiXML")
 config.add_option("", "--midi-format", type="int", default=1,
                   help="[midi] The Midi file type (must be either 0 or 1)")
+config.add_option("", "--measures", action="store",
+                  help="[general] Only convert the given measures (N, N-M, N- or -M, counting from 1)")
 
 def make_event(subevent, time_spine, ticks_per_quarter_note):
    event = Element("Event")
@@ -45,11 +49,18 @@ def make_event(subevent, time_spine, ticks_per_quarter_note):
    return event
 
 class MusicXMLToMidiXML:
-   def __init__(self, ticks_per_beat=TICKS_PER_BEAT):
+   def __init__(self, ticks_per_beat=TICKS_PER_BEAT, measures=None):
+      """measures is the range of measures to convert (see
+      GuidoToMusicXML); the excerpt begins at time 0."""
       self._ticks_per_beat = config.get("ticks_per_beat")
       self._warnings = config.get("warnings")
       self._verbose = config.get("verbose")
       self._divisions = config.get("divisions")
+      if measures is None:
+         measures = config.get("measures") or (1, None)
+      if type(measures) in (StringType, UnicodeType):
+         measures = measure_range(measures)
+      self._first_measure, self._last_measure = measures
 
    class State:
       def __init__(self):
@@ -59,6 +70,13 @@ class MusicXMLToMidiXML:
          self.used_channels = {}
          self.dynamics = 64
          self.warnings = []
+         # While skipping to the first measure of an excerpt: the last
+         # element of each kind in _carried_elements
+         self.carried = {}
+
+   # The elements whose effect lasts, so that the last of each before
+   # an excerpt is output at its beginning
+   _carried_elements = ("key", "time", "sound")
 
    ########################################
    # utility methods
@@ -70,6 +88,21 @@ class MusicXMLToMidiXML:
          return getattr(self, func_name)(element, time_spine, events, meta_events, state)
       return None
 
+   def in_excerpt(self, measure, position):
+      """Returns -1, 0 or 1 if the given <measure> (the position'th of
+      its part, counting from 1) is before, in or after the range of
+      measures to convert.  A range from measure 1 includes any
+      pickup measure (usually numbered 0)."""
+      try:
+         number = int(measure.attrib["number"])
+      except ValueError:
+         number = position
+      if number < self._first_measure and self._first_measure > 1:
+         return -1
+      if self._last_measure is not None and number > self._last_measure:
+         return 1
+      return 0
+
    def convert_duration(self, duration, divisions):
       return float(duration) / float(divisions) * float(self._ticks_per_beat)
 
@@ -121,7 +154,9 @@ class MusicXMLToMidiXML:
       for part in music_xml.findall("./part"):
          time_spine = 0
          duration = 0
-         for measure in part:
+         for i, measure in enumerate(part):
+            if self.in_excerpt(measure, i + 1) > 0:
+               break
             measure_no = measure.attrib["number"]
             measure_lengths.setdefault(measure_no, 0)
             for element in measure:
@@ -184,8 +219,21 @@ class MusicXMLToMidiXML:
       # (DIVISIONS) until we write out (TICKS_PER_BEAT).  This prevents rounding error
       # from accumulating as durations are summed together, particularly since you
       # have to use such low numbers for TicksPerBeat in the MIDI spec.
-      for measure in part:
+      # The start of the excerpt
+      offset = 0
+      for i, measure in enumerate(part):
+         position = self.in_excerpt(measure, i + 1)
+         if position > 0:
+            break
          measure_no = measure.attrib["number"]
+         if position < 0:
+            # Only the time, and the state that lasts into the
+            # excerpt, are kept from the measures before it
+            self.skip_measure(measure, state)
+            time_spine = offset = state.measure_lengths[measure_no]
+            continue
+         if len(state.carried):
+            self.make_carried_elements(events, meta_events, state)
          for element in measure:
             if element.find("./chord") is None:
                time_spine += duration
@@ -204,19 +252,41 @@ class MusicXMLToMidiXML:
                time_spine += duration
                duration = 0
             else:
-               self.dispatch_element(element, time_spine, events, meta_events, state)
+               self.dispatch_element(element, time_spine - offset, events, meta_events, state)
          time_spine = state.measure_lengths[measure_no]
          duration = 0
 
-      if element.find("./chord") is None:
-         time_spine += duration
-
       if state.format == 1:
          events.sort(lambda x, y: cmp(x.time_spine, y.time_spine))
          track = SubElement(midi, "Track", Number=str(state.part_no))
          for event in events:
             track.append(event)
 
+   def skip_measure(self, measure, state):
+      for element in measure:
+         if element.tag == "attributes":
+            state.divisions = element.findtext("./divisions") or state.divisions
+         for child in element.getiterator():
+            if child.tag == "sound":
+               # Dynamics are only state, so just the tempo is carried
+               tempo = child.get("tempo")
+               if tempo != None:
+                  state.carried["sound"] = Element("sound", tempo=tempo)
+               dynamics = child.get("dynamics")
+               if dynamics != None:
+                  state.dynamics = int_range_check(dynamics, 0, MAX_7_BIT,
+                                                   "<sound dynamics='x'>", state.warnings)
+            elif child.tag in self._carried_elements:
+               state.carried[child.tag] = child
+
+   def make_carried_elements(self, events, meta_events, state):
+      """Outputs the key, time signature and tempo in effect at the
+      beginning of an excerpt."""
+      for tag in self._carried_elements:
+         if state.carried.has_key(tag):
+            self.dispatch_element(state.carried[tag], 0, events, meta_events, state)
+      state.carried = {}
+
    ########################################
    # Concrete elements
 
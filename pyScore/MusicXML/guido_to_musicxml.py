@@ -26,8 +26,10 @@ from pyScore.Guido.objects.basic.staff import staff as staff_tag
 from pyScore.Guido.objects.basic.instrument import instrument as instrument_tag
 from pyScore.MusicXML.conversion_constants import *
 from pyScore.util.rational import Rat
+from pyScore.util.range_checking import measure_range
 from pyScore.util.config import *
 
+from types import StringType, UnicodeType
 import sys
 
 Element = ElementTree.Element
@@ -38,6 +40,8 @@ SubElement = ElementTree.SubElement
 # NOTE: Guido \\splitChord tag is completely unsupported
 
 config.add_option("", "--divisions", action="store", default=144, type="int")
+config.add_option("", "--measures", action="store",
+                  help="[general] Only convert the given measures (N, N-M, N- or -M, counting from 1)")
 
 class ExtendedSequence(core.INLINE_COLLECTION):
    """This class stores a few more bits of information about Guido sequences
@@ -66,20 +70,45 @@ the Guido stream, such as stem direction..."""
          self.measure_no = 0
          self.last_tuplet = None
          self.last_ending = None
-
-   def __init__(self):
+         # While skipping to the first measure of an excerpt: the last
+         # tag of each kind in _carried_tags, by (kind, staff)
+         self.carried = {}
+
+   # The tags whose effect lasts, so that the last of each before an
+   # excerpt is output at its beginning
+   _carried_tags = ("clef", "key", "meter", "tempo", "intensity")
+   # Tags that only change the state, or the header, which are
+   # dispatched even when skipped
+   _skipped_tags = ("stemsAuto", "stemsUp", "stemsDown",
+                    "title", "composer", "lyricist")
+
+   def __init__(self, measures=None):
+      """measures is the range of measures to convert, as a (first,
+      last) pair counting from 1 (last may be None, for the end of the
+      score), or a string for measure_range.  By default it is the
+      --measures option, or the whole score."""
       self._divisions = config.get("divisions")
       assert type(self._divisions) == int
       self._quarter_divisions = self._divisions * 4
       self._warnings = config.get("warnings")
       self._verbose = config.get("verbose")
+      if measures is None:
+         measures = config.get("measures") or (1, None)
+      if type(measures) in (StringType, UnicodeType):
+         measures = measure_range(measures)
+      self._first_measure, self._last_measure = measures
 
    def g2m_duration(self, d):
       return int((d.num * self._quarter_divisions) / d.den)
 
+   def g2m_ticks(self, ticks):
+      """Converts a duration in the ticks of the score being converted
+      (see core.TimeBase) to MusicXML divisions."""
+      return (ticks * self._quarter_divisions) / self._ticks_per_whole
+
    def convert(self, score):
       assert isinstance(score, core.Score)
-      score.calc_time_spines()
+      self._ticks_per_whole = score.calc_time_spines().ticks_per_whole
 
       self.last_ending = None
 
@@ -88,6 +117,8 @@ the Guido stream, such as stem direction..."""
       SubElement(score_partwise, "identification")
 
       staff_layout, barlines = self.make_plan(score)
+      if self._first_measure > len(barlines) + 1:
+         raise ValueError("There are only %d measures in the score." % (len(barlines) + 1))
       self.make_part_list(score_partwise, staff_layout)
       self.make_parts(score_partwise, staff_layout, barlines)
       return score_partwise
@@ -121,8 +152,8 @@ the Guido stream, such as stem direction..."""
                sequence.staves[current_staff] = None
                item.staff = current_staff
                if isinstance(item, core.Barline):
-                  if not item.time_spine in barlines:
-                     barlines.add(item.time_spine)
+                  if not item.ticks in barlines:
+                     barlines.add(item.ticks)
                      if i and self._warnings:
                         barline_warnings.append(item.time_spine)
          if len(barline_warnings):
@@ -183,14 +214,14 @@ the Guido stream, such as stem direction..."""
                   collection.extend(sequence.collection)
                   used_sequences.append(sequence)
                   num_staves = max(len(sequence.staves), num_staves)
-            collection.sort(lambda x, y: cmp(x.time_spine, y.time_spine))
+            collection.sort(key=lambda x: x.ticks)
             state = self.State()
-            measure = SubElement(part_tag, "measure", number=str(state.measure_no + 1))
+            measure = SubElement(part_tag, "measure", number=str(self._first_measure))
             attributes = SubElement(measure, "attributes")
             SubElement(attributes, "divisions").text = str(self._divisions)
             if num_staves > 1:
                SubElement(attributes, "staves").text = str(num_staves)
-            self.make_part(collection, barlines, part_tag, Rat(0, 1), measure, state)
+            self.make_part(collection, barlines, part_tag, 0, measure, state)
             if state.last_ending != None:
                state.last_ending.find("./ending").set("type", "stop")
             # Delete empty measures (if any) at end of part
@@ -198,60 +229,145 @@ the Guido stream, such as stem direction..."""
                part_tag.remove(part_tag[-1])
             part_no += 1
 
-   def make_part(self, collection, barlines, part, time_spine, measure, state):
+   def make_part(self, collection, barlines, part, ticks, measure, state):
+      # Times are in ticks (see core.TimeBase)
+      ticks_per_whole = self._ticks_per_whole
+      # Measures are counted from 0 here
+      first_measure = self._first_measure - 1
+      if self._last_measure is None:
+         last_measure = len(barlines)
+      else:
+         last_measure = self._last_measure - 1
+      skipping = first_measure > 0
       last_item = None
       for item in collection:
          if isinstance(item, core.Empty):
             continue
-         time_spine = self.adjust_time(time_spine, item.time_spine, measure)
-         if isinstance(item, core.TAG):
-            direction = SubElement(measure, "direction")
-            self.dispatch_tag(item, measure, direction, state)
-            if not len(direction):
-               measure.remove(direction)
-            else:
-               if item.parent.voice != None:
-                  sound = direction.find("./sound")
-                  SubElement(direction, "voice").text = str(item.parent.voice)
-                  if sound is not None:
-                     direction.remove(sound)
-                     direction.append(sound)
-         if isinstance(item, (core.Barline, core.DURATIONAL)):
-            if (state.measure_no < len(barlines) and
-                item.time_spine >= barlines[state.measure_no]):
+         if skipping:
+            if (isinstance(item, (core.Barline, core.DURATIONAL)) and
+                item.ticks >= barlines[state.measure_no]):
                state.measure_no += 1
-               measure = SubElement(
-                  part, "measure", number=str(state.measure_no + 1))
+               if state.measure_no == first_measure:
+                  # The excerpt begins in the measure already made by
+                  # make_parts.  A barline here ends the measure before.
+                  skipping = False
+                  ticks = barlines[state.measure_no - 1]
+                  self.make_carried_tags(measure, state)
+                  if isinstance(item, core.Barline):
+                     continue
+                  ticks = self.adjust_time(ticks, item.ticks, measure)
+            if skipping:
+               self.skip_item(item, state)
+               ticks = item.ticks + item.get_ticks(ticks_per_whole)
+               continue
+         else:
+            ticks = self.adjust_time(ticks, item.ticks, measure)
+            if isinstance(item, core.TAG):
+               self.make_direction(item, measure, state)
+            if isinstance(item, (core.Barline, core.DURATIONAL)):
+               if (state.measure_no < len(barlines) and
+                   item.ticks >= barlines[state.measure_no]):
+                  state.measure_no += 1
+                  if state.measure_no > last_measure:
+                     break
+                  measure = SubElement(
+                     part, "measure", number=str(state.measure_no + 1))
          if isinstance(item, core.EVENT):
             direction = None
             self.make_note(item, measure, state)
          if isinstance(item, core.Chord):
             direction = None
             self.make_chord(item, measure, state)
-         time_spine += item.get_duration()
+         ticks += item.get_ticks(ticks_per_whole)
          last_item = item
-      return time_spine, measure
+      return ticks, measure
+
+   def make_direction(self, item, measure, state):
+      direction = SubElement(measure, "direction")
+      self.dispatch_tag(item, measure, direction, state)
+      if not len(direction):
+         measure.remove(direction)
+      else:
+         if item.parent.voice != None:
+            sound = direction.find("./sound")
+            SubElement(direction, "voice").text = str(item.parent.voice)
+            if sound is not None:
+               direction.remove(sound)
+               direction.append(sound)
+
+   # Excerpts ########################################
+
+   def skip_item(self, item, state):
+      """Passes over an item before the first measure to convert,
+      keeping the state that carries over into the excerpt."""
+      if isinstance(item, core.TAG):
+         name = item.__class__.__name__
+         if name in self._carried_tags:
+            if item.mode != "End":
+               state.carried[(name, item.staff)] = item
+         elif name in self._skipped_tags:
+            scratch = Element("measure")
+            self.dispatch_tag(item, scratch, SubElement(scratch, "direction"), state)
+      elif isinstance(item, core.Chord):
+         # Only the first note of a chord has ties, slurs and beams
+         if len(item.collection) and isinstance(item.collection[0], core.EVENT):
+            self.skip_note(item.collection[0], state)
+      elif isinstance(item, core.EVENT):
+         self.skip_note(item, state)
+
+   def skip_note(self, item, state):
+      """Numbers the ties, slurs and beams that begin or end on a
+      skipped note, as make_note would, so that those still open at
+      the excerpt continue with the same numbers."""
+      if item.get_ticks(self._ticks_per_whole) == 0:
+         return
+      if not len(item.get_tag("cue")):
+         for tie in item.get_tag("tie"):
+            if tie.is_first(item):
+               state.active_ties.begin(tie, "ties")
+            elif tie.is_last(item):
+               state.active_ties.end(tie)
+      beams = state.active_beams[item.parent.voice]
+      for beam in item.get_tag("beam"):
+         if beam.is_first(item):
+            beams.begin(beam, "beams")
+         elif beam.is_last(item):
+            beams.end(beam)
+      for slur in item.get_tag("slur"):
+         if slur.is_first(item):
+            state.active_slurs.begin(slur, "slurs")
+         elif slur.is_last(item):
+            state.active_slurs.end(slur)
+
+   def make_carried_tags(self, measure, state):
+      """Outputs the clefs, keys, meters, tempos and dynamics in effect
+      at the beginning of an excerpt."""
+      carried = state.carried.values()
+      carried.sort(key=lambda x: x.ticks)
+      for tag in carried:
+         self.make_direction(tag, measure, state)
+      state.carried = {}
 
    def adjust_time(self, current, next, measure):
-      # We do g2m_duration on current and next so that the
-      # subtraction is on integers, not rationals.
+      # We do g2m_ticks on current and next separately so that the
+      # result is the same as the difference of their MusicXML times.
       if current != next:
          if next < current:
             backup = SubElement(measure, "backup")
             SubElement(backup, "duration").text = str(
-               self.g2m_duration(current) -
-               self.g2m_duration(next))
+               self.g2m_ticks(current) -
+               self.g2m_ticks(next))
          else:
             forward = SubElement(measure, "forward")
             SubElement(forward, "duration").text = str(
-               self.g2m_duration(next) -
-               self.g2m_duration(current))
+               self.g2m_ticks(next) -
+               self.g2m_ticks(current))
       return next
 
    # <note> elements ########################################
 
    def make_note(self, item, measure, state, chord=False):
-      if item.get_duration() == 0:
+      if item.get_ticks(self._ticks_per_whole) == 0:
          return
       note = SubElement(measure, "note")
       ties = []
@@ -324,7 +440,8 @@ the Guido stream, such as stem direction..."""
          SubElement(note, "rest")
 
    def make_duration(self, item, note, state):
-      SubElement(note, "duration").text = str(self.g2m_duration(item.get_duration()))
+      SubElement(note, "duration").text = str(
+         self.g2m_ticks(item.get_ticks(self._ticks_per_whole)))
 
    def make_tie(self, item, note, state):
       result = []
@@ -18,13 +18,22 @@ Copyright (c) 2002-2008 Michael Droettboom
 ## along with this program; if not, write to the Free Software
 ## Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
 
+from pyScore.util.instrument import run_step
+
 from inspect import getargspec
+from types import DictType
 import sys
 
 def dummy_function(percent):
    pass
 
 class ConverterGraph:
+   """The conversions between formats made by chaining the X_to_Y
+   functions in a set of converter modules.  The shortest route
+   between every pair of formats, and the arguments each function
+   takes, are found once when the graph is built, so a graph can be
+   reused for any number of conversions (see get_converter_graph)."""
+
    def __init__(self, modules):
       self.inputs = {}
       self.outputs = []
@@ -47,39 +56,158 @@ class ConverterGraph:
                         "Multiple direct routes from '%s' to '%s'." % (input, output))
                   converters[converter] = None
                   self.inputs[input][output] = getattr(module, converter_name)
+      # converter -> the names of its arguments
+      self._arg_names = {}
+      for converter in converters.keys():
+         self._arg_names[converter] = tuple(getargspec(converter)[0])
+      # (input, output) -> steps
+      self._routes = {}
+      for output in self.outputs:
+         self._add_routes_to(output)
+
+   def _add_routes_to(self, output):
+      """Finds the shortest route from every format to output.  The
+      distances to output are found by a breadth-first search
+      backwards from it; then, from each format, the route follows the
+      first converter (in the order of self.inputs) that gets one step
+      closer.  The route from output to itself is the shortest round
+      trip."""
+      sources = {}
+      for input, val in self.inputs.items():
+         for key in val.keys():
+            sources.setdefault(key, []).append(input)
+      distances = {output: 0}
+      queue = [output]
+      for node in queue:
+         for input in sources.get(node, []):
+            if not distances.has_key(input):
+               distances[input] = distances[node] + 1
+               queue.append(input)
+      for input in self.inputs.keys():
+         if input == output:
+            steps = self._get_round_trip(output, distances)
+         elif distances.has_key(input):
+            steps = self._follow_route(input, output, distances)
+         else:
+            steps = None
+         if steps is not None:
+            self._routes[(input, output)] = steps
 
-   def _get_steps(self, input, output, tried=[]):
-      if self.inputs[input].has_key(output):
-         return [(self.inputs[input][output], input, output)]
-      options = []
-      for key, val in self.inputs[input].items():
-         if key not in tried and self.inputs.has_key(key):
-            option = self._get_steps(key, output, tried + [input])
-            if len(option) and option[-1][-1] == output:
-               options.append([(val, input, key)] + option)
-      if len(options):
-         options.sort(lambda x, y: cmp(len(x), len(y)))
-         return options[0]
-      return []
+   def _follow_route(self, input, output, distances):
+      steps = []
+      node = input
+      while node != output:
+         val = self.inputs[node]
+         if val.has_key(output):
+            next = output
+         else:
+            for next in val.keys():
+               if distances.get(next) == distances[node] - 1:
+                  break
+         steps.append((val[next], node, next))
+         node = next
+      return steps
+
+   def _get_round_trip(self, output, distances):
+      val = self.inputs[output]
+      if val.has_key(output):
+         return [(val[output], output, output)]
+      best = None
+      for key in val.keys():
+         if (self.inputs.has_key(key) and distances.has_key(key) and
+             (best is None or distances[key] < distances[best])):
+            best = key
+      if best is None:
+         return None
+      return [(val[best], output, best)] + self._follow_route(best, output, distances)
 
    def get_steps(self, input, output):
-      if self.inputs.has_key(input) and output in self.outputs:
-         steps = self._get_steps(input, output)
-         if len(steps):
-            return steps
-      raise ValueError(
-         "There is no way to convert '%s' to '%s'." % (input, output))
-
-   def run_steps(self, steps, input, progress_callback=dummy_function, **kwargs):
+      steps = self._routes.get((input, output))
+      if steps is None:
+         raise ValueError(
+            "There is no way to convert '%s' to '%s'." % (input, output))
+      return list(steps)
+
+   def run_steps(self, steps, input, progress_callback=dummy_function, sink=None, **kwargs):
+      """Runs the steps from get_steps on input.  If a sink is given,
+      it is called with the timing and memory use of each step (see
+      pyScore.util.instrument)."""
+      arg_names = self._arg_names
+      last = max(len(steps) - 1, 1)
       for i, (step, a, b) in enumerate(steps):
          new_dict = {}
-         for key in getargspec(step)[0]:
+         names = arg_names.get(step)
+         if names is None:
+            names = getargspec(step)[0]
+         for key in names:
             if kwargs.has_key(key):
                new_dict[key] = kwargs[key]
-         input = step(input, **new_dict)
-         progress_callback(float(i) / float(len(steps) - 1))
+         if sink is None:
+            input = step(input, **new_dict)
+         else:
+            input = run_step(step, input, new_dict, sink, i, a, b)
+         progress_callback(float(i) / float(last))
       return input
 
+   def get_fan_out_steps(self, input, outputs):
+      """Returns the steps to convert input to every one of the
+      outputs, in an order in which they can be run.  A format on the
+      way to more than one output is made only once."""
+      made = {}
+      steps = []
+      for output in outputs:
+         for step in self.get_steps(input, output):
+            if not made.has_key(step[2]):
+               made[step[2]] = None
+               steps.append(step)
+      return steps
+
+   def run_fan_out_steps(self, steps, input, outputs, progress_callback=dummy_function, sink=None, **kwargs):
+      """Runs the steps from get_fan_out_steps, returning a dictionary
+      from each of the outputs to its result.  outputs may also be a
+      dictionary from each output to the keyword arguments for the
+      step that makes it only (such as its filename); the rest of
+      kwargs go to every step, as for run_steps.  Each intermediate
+      result is dropped once the last step that needs it has run.
+      sink is as for run_steps."""
+      if type(outputs) != DictType:
+         outputs = dict([(x, {}) for x in outputs])
+      if not len(steps):
+         return {}
+      arg_names = self._arg_names
+      # The input is only ever read by the first steps, so a round trip
+      # back to its format does not replace it
+      input_format = steps[0][1]
+      uses = {}
+      for step, a, b in steps:
+         uses[a] = uses.get(a, 0) + 1
+      values = {input_format: input}
+      results = {}
+      last = max(len(steps) - 1, 1)
+      for i, (step, a, b) in enumerate(steps):
+         step_kwargs = kwargs.copy()
+         step_kwargs.update(outputs.get(b, {}))
+         new_dict = {}
+         names = arg_names.get(step)
+         if names is None:
+            names = getargspec(step)[0]
+         for key in names:
+            if step_kwargs.has_key(key):
+               new_dict[key] = step_kwargs[key]
+         if sink is None:
+            result = step(values[a], **new_dict)
+         else:
+            result = run_step(step, values[a], new_dict, sink, i, a, b)
+         uses[a] -= 1
+         if not uses[a]:
+            del values[a]
+         if b != input_format and uses.has_key(b):
+            values[b] = result
+         if outputs.has_key(b):
+            results[b] = result
+         progress_callback(float(i) / float(last))
+      return results
+
    def make_dot_file(self, file):
       file.write("digraph g {\n")
       nodes = {}
@@ -95,9 +223,30 @@ class ConverterGraph:
             file.write('"%s" -> "%s";\n' % (input.replace("_", " "), output.replace("_", " ")))
       file.write("}\n")
 
+# (id of each module) -> ConverterGraph
+_converter_graphs = {}
+
+def get_converter_graph(modules):
+   """Returns the ConverterGraph of the given modules.  It is built
+   once and shared by everything in the process that uses them."""
+   key = tuple([id(module) for module in modules])
+   graph = _converter_graphs.get(key)
+   if graph is None:
+      graph = _converter_graphs[key] = ConverterGraph(modules)
+   return graph
+
 def convert(modules, input_format, output_format, input, stream=sys.stdout, progress_callback=dummy_function, **kwargs):
-   converter = ConverterGraph(modules)
+   converter = get_converter_graph(modules)
    steps = converter.get_steps(input_format, output_format)
    return converter.run_steps(steps, input, stream=stream, progress_callback=progress_callback, **kwargs)
 
-__all__ = "ConverterGraph convert".split()
+def convert_to_many(modules, input_format, outputs, input, stream=sys.stdout, progress_callback=dummy_function, **kwargs):
+   """Converts input to each of the outputs (see
+   ConverterGraph.run_fan_out_steps) in one pass, returning a
+   dictionary from each output to its result."""
+   converter = get_converter_graph(modules)
+   steps = converter.get_fan_out_steps(input_format, outputs)
+   return converter.run_fan_out_steps(steps, input, outputs, stream=stream,
+                                      progress_callback=progress_callback, **kwargs)
+
+__all__ = "ConverterGraph get_converter_graph convert convert_to_many".split()
@@ -31,7 +31,7 @@ def FileWriter(filename, encoding="utf8"):
             fd = gzip.GzipFile(filename, "w")
         else:
             fd = file(filename, "w")
-    elif hasattr(fd, 'write'):
+    elif hasattr(filename, 'write'):
         fd = filename
     else:
         raise ValueError("Argument 1 of 'FileWriter' is not a filename or file object.")
@@ -48,7 +48,7 @@ def FileReader(filename, encoding="utf8"):
             fd = gzip.GzipFile(filename, "rU")
         else:
             fd = file(filename, "rU")
-    elif hasattr(fd, 'read'):
+    elif hasattr(filename, 'read'):
         fd = filename
     else:
         raise ValueError("Argument 1 of 'FileReader' is not a filename or file object.")
@@ -0,0 +1,207 @@
+"""
+Timing and memory use of the steps of a conversion
+
+Copyright (c) 2002-2008 Michael Droettboom
+"""
+## This program is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License
+## as published by the Free Software Foundation; either version 2
+## of the License, or (at your option) any later version.
+
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+
+## You should have received a copy of the GNU General Public License
+## along with this program; if not, write to the Free Software
+## Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+
+# ConverterGraph.run_steps takes a sink, which is any callable.  It is
+# called with a record (a dictionary) after each step:
+#
+#   step            the name of the converter function
+#   index           the number of the step in the conversion
+#   input_format    the formats the step converts between
+#   output_format
+#   wall_time       seconds of real time
+#   cpu_time        seconds of user and system CPU time
+#   rss             the resident set size of the process after the
+#                   step, in bytes
+#   rss_change      how much the step changed the resident set size,
+#                   in bytes (it may be negative)
+#   process_peak_rss
+#                   the largest resident set size of the process so
+#                   far, in bytes.  It never goes down, so it is that
+#                   of the largest step so far, not of this one.
+#   input_size      a dictionary of counts describing the input and
+#   output_size     output, depending on their format: 'bytes' of a
+#                   file, 'chars' of a string, 'elements' and 'notes'
+#                   of an XML tree, 'objects' and 'notes' of a GUIDO
+#                   tree or 'items' of a list
+#
+# The memory figures are None where they can not be found.  rss is
+# read from /proc/self/statm, so it is only available on Linux.  Python
+# 2 has no way to find the peak memory of a single step, so rss and
+# rss_change only show what is still in use at the end of the step:
+# memory used only during the step is missed, and memory that Python
+# keeps for reuse after freeing it is counted.
+
+from types import StringType, UnicodeType, ListType, TupleType
+from os.path import isfile, getsize
+import os
+import sys
+import time
+
+try:
+   import resource
+except ImportError:
+   resource = None
+try:
+   import json
+except ImportError:
+   try:
+      import simplejson as json
+   except ImportError:
+      json = None
+
+def get_cpu_time():
+   times = os.times()
+   return times[0] + times[1]
+
+def get_size(value, format, filename=None):
+   """Returns a dictionary of counts describing a value of the given
+   format.  The values of the _file formats are filenames; if a step
+   writes a file, its filename is given instead."""
+   if format.endswith("_file"):
+      if filename is None:
+         filename = value
+      if type(filename) in (StringType, UnicodeType) and isfile(filename):
+         return {"bytes": getsize(filename)}
+      return {}
+   if type(value) in (StringType, UnicodeType):
+      return {"chars": len(value)}
+   if hasattr(value, "getiterator"):
+      elements = notes = 0
+      for element in value.getiterator():
+         elements += 1
+         if element.tag in ("note", "NoteOn"):
+            notes += 1
+      return {"elements": elements, "notes": notes}
+   if hasattr(value, "visit_flat"):
+      from pyScore.Guido.objects import core
+      objects = notes = 0
+      for item in value.visit_flat():
+         objects += 1
+         if isinstance(item, core.Note):
+            notes += 1
+      return {"objects": objects, "notes": notes}
+   if type(value) in (ListType, TupleType):
+      return {"items": len(value)}
+   return {}
+
+def get_rss():
+   """Returns the resident set size of this process, in bytes, or None
+   if it can not be found."""
+   try:
+      fd = open("/proc/self/statm")
+      try:
+         return int(fd.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+      finally:
+         fd.close()
+   except (IOError, OSError, ValueError, AttributeError):
+      return None
+
+def get_peak_rss():
+   """Returns the largest resident set size this process has had, in
+   bytes, or None if it can not be found."""
+   if resource is None:
+      return None
+   maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+   # Linux gives kilobytes, Mac OS-X bytes
+   if sys.platform != "darwin":
+      maxrss *= 1024
+   return maxrss
+
+def run_step(step, input, kwargs, sink, index, input_format, output_format):
+   """Runs step(input, **kwargs), sending its record to sink, and
+   returns its result."""
+   input_size = get_size(input, input_format)
+   rss_start = get_rss()
+   cpu_start = get_cpu_time()
+   start = time.time()
+   try:
+      output = step(input, **kwargs)
+   finally:
+      wall_time = time.time() - start
+      cpu_time = get_cpu_time() - cpu_start
+      rss = get_rss()
+   if rss is None or rss_start is None:
+      rss_change = None
+   else:
+      rss_change = rss - rss_start
+   sink({"step": step.__name__,
+         "index": index,
+         "input_format": input_format,
+         "output_format": output_format,
+         "wall_time": wall_time,
+         "cpu_time": cpu_time,
+         "rss": rss,
+         "rss_change": rss_change,
+         "process_peak_rss": get_peak_rss(),
+         "input_size": input_size,
+         "output_size": get_size(output, output_format, kwargs.get("filename"))})
+   return output
+
+class JSONLinesSink:
+   """Writes each record as a line of JSON to a file (or a filename,
+   which is appended to)."""
+   def __init__(self, file):
+      if json is None:
+         raise ImportError("Writing JSON requires the json or simplejson module.")
+      if type(file) in (StringType, UnicodeType):
+         self._file = open(file, "a")
+         self._close = True
+      else:
+         self._file = file
+         self._close = False
+
+   def __call__(self, record):
+      self._file.write(json.dumps(record, sort_keys=True) + "\n")
+      self._file.flush()
+
+   def close(self):
+      if self._close:
+         self._file.close()
+
+class StatsCollector:
+   """Keeps every record, for looking at in the same process."""
+   def __init__(self):
+      self.records = []
+
+   def __call__(self, record):
+      self.records.append(record)
+
+   def get_totals(self):
+      """Returns a dictionary from each step's name to the number of
+      times it ran and its total wall and CPU time."""
+      totals = {}
+      for record in self.records:
+         total = totals.setdefault(
+            record["step"], {"count": 0, "wall_time": 0.0, "cpu_time": 0.0})
+         total["count"] += 1
+         total["wall_time"] += record["wall_time"]
+         total["cpu_time"] += record["cpu_time"]
+      return totals
+
+   def format(self):
+      """Returns the totals as lines of text, slowest step first."""
+      totals = self.get_totals().items()
+      totals.sort(lambda x, y: cmp(y[1]["wall_time"], x[1]["wall_time"]))
+      lines = []
+      for name, total in totals:
+         lines.append("%-40s %4d %9.4f s wall %9.4f s CPU" %
+                      (name, total["count"], total["wall_time"], total["cpu_time"]))
+      return lines
+
+__all__ = "run_step get_size get_rss get_peak_rss JSONLinesSink StatsCollector".split()
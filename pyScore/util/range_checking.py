@@ -31,3 +31,24 @@ def int_range_check(s, min, max, message, warnings):
          i = max
    return i
 
+
+def measure_range(s):
+   """Converts a range of measures, counting from 1, to a (first, last)
+   pair.  s may be 'N', 'N-M', 'N-' (to the end) or '-M' (from the
+   beginning); last is None when the range is open at the end."""
+   if "-" in s:
+      first, last = s.split("-", 1)
+   else:
+      first = last = s
+   try:
+      first = int(first.strip() or "1")
+      last = last.strip()
+      if last:
+         last = int(last)
+      else:
+         last = None
+   except ValueError:
+      raise ValueError("'%s' is not a range of measures (N, N-M, N- or -M)." % s)
+   if first < 1 or (last is not None and last < first):
+      raise ValueError("'%s' is not a range of measures (N, N-M, N- or -M)." % s)
+   return first, last
@@ -19,7 +19,7 @@ Copyright (c) 2002-2008 Michael Droettboom
 ## Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
 
 try:
-    from crat import rational as Rat
+    from _rational import Rat
 except ImportError:
     from Rat import Rat
 
@@ -18,7 +18,8 @@ Copyright (c) 2002-2008 Michael Droettboom
 ## Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
 
 from pyScore.config import config
-from pyScore.convert import ConverterGraph
+from pyScore.convert import ConverterGraph, get_converter_graph
+from pyScore.util.instrument import JSONLinesSink, StatsCollector
 from pyScore.elementtree.ElementTree import parse, tostring
 from pyScore.Guido import noteserver
 from pyScore.util.console import *
@@ -27,12 +28,27 @@ try:
    import textwrap
 except ImportError:
    from pyScore.util.backport import textwrap
+try:
+   import multiprocessing
+except ImportError:
+   multiprocessing = None
+try:
+   from optparse import Values
+except ImportError:
+   from pyScore.util.backport.optparse import Values
 
 from glob import glob
+from httplib import HTTPConnection
+from itertools import izip
+from StringIO import StringIO
+from types import StringType, UnicodeType
 from time import strftime
 from os.path import splitext, split, join, exists, isdir, isfile
 import os
+import shutil
 import sys
+import threading
+import time
 import traceback
 from urllib import urlencode
 
@@ -42,19 +58,183 @@ class Format:
       self.ext = ext
       self.converter = converter
 
+def add_stats_option():
+   config.add_option("", "--stats", action="store",
+                     help="[general] Append the time and memory use of each conversion step to this file, as JSON lines")
+
+def get_stats_sink(options):
+   if options.stats:
+      return JSONLinesSink(options.stats)
+   return None
+
+def add_jobs_option(default=1):
+   """Adds the -j option, read with get_jobs.  0, as the option or the
+   default, means one process per CPU."""
+   if default == 0:
+      default_help = "one per CPU"
+   else:
+      default_help = str(default)
+   config.add_option("-j", "--jobs", action="store", type="int",
+                     help="[general] Number of processes to use, or 0 for one per CPU (default: %s)" % default_help)
+
+def get_jobs(options, num_files=None, default=1):
+   """Returns the number of processes to use for the -j option (see
+   add_jobs_option), and no more than num_files if given."""
+   jobs = options.jobs
+   if jobs is None:
+      jobs = default
+   if multiprocessing is None:
+      jobs = 1
+   elif jobs == 0:
+      jobs = multiprocessing.cpu_count()
+   if num_files is not None:
+      jobs = min(jobs, num_files)
+   return jobs
+
+def plan_conversion(converter, input_converter, output_converters):
+   if len(output_converters) == 1:
+      return converter.get_steps(input_converter, output_converters[0])
+   return converter.get_fan_out_steps(input_converter, output_converters)
+
+def run_conversion(converter, steps, filename, outputs, progress_callback, sink):
+   """Converts filename with the steps from plan_conversion.  outputs is
+   the output filename, or for more than one output format, the
+   dictionary of keyword arguments for run_fan_out_steps."""
+   if type(outputs) in (StringType, UnicodeType):
+      converter.run_steps(
+         steps, filename, filename=outputs, progress_callback=progress_callback,
+         sink=sink)
+   else:
+      converter.run_fan_out_steps(
+         steps, filename, outputs, progress_callback=progress_callback, sink=sink)
+
+# The ConverterGraph and steps of a worker process
+_worker = None
+
+def _init_worker(module_names, input_converter, output_converters):
+   """Imports the converter modules and plans the conversion, once in
+   each worker process."""
+   global _worker
+   modules = []
+   for name in module_names:
+      __import__(name)
+      modules.append(sys.modules[name])
+   converter = get_converter_graph(modules)
+   _worker = (converter, plan_conversion(converter, input_converter, output_converters))
+
+def _dummy_progress(percent):
+   pass
+
+def _convert_in_worker(job):
+   """Converts one file in a worker process.  Returns what the
+   conversion printed, the traceback if it failed, and the records of
+   its steps if they were asked for."""
+   filename, outputs, stats = job
+   converter, steps = _worker
+   if stats:
+      sink = StatsCollector()
+   else:
+      sink = None
+   error = None
+   stdout, stderr = sys.stdout, sys.stderr
+   sys.stdout = sys.stderr = printed = StringIO()
+   try:
+      try:
+         run_conversion(converter, steps, filename, outputs, _dummy_progress, sink)
+      except:
+         # Not just Exception: ParseError is an old-style class, and a
+         # worker that raises does not return its result, so imap
+         # would wait for it forever
+         error = "".join(traceback.format_exception(*sys.exc_info()))
+   finally:
+      sys.stdout, sys.stderr = stdout, stderr
+   if sink is None:
+      records = []
+   else:
+      records = sink.records
+   return printed.getvalue(), error, records
+
+def convert_each_in_pool(modules, input_converter, output_converters, work, jobs):
+   """Converts work, a list of (filename, outputs, stats) (see
+   run_conversion), across 'jobs' worker processes.  Yields what the
+   conversion of each file printed, the traceback if it failed, and
+   the records of its steps if stats is true, in order as they
+   finish."""
+   module_names = [module.__name__ for module in modules]
+   # Conversions take much longer than passing the filenames, so the
+   # batches are smaller than lint's
+   chunksize = max(1, min(16, len(work) / (jobs * 4)))
+   pool = multiprocessing.Pool(
+      jobs, _init_worker, (module_names, input_converter, output_converters))
+   try:
+      for result in pool.imap(_convert_in_worker, work, chunksize):
+         yield result
+      pool.close()
+   finally:
+      pool.terminate()
+      pool.join()
+
+def convert_in_pool(modules, input_converter, output_converters, files, jobs, sink):
+   """Converts files, a list of (filename, outputs, message), as
+   convert_each_in_pool.  The message and output of each file are
+   printed in order as they finish.  A file that fails does not stop
+   the others; the number that failed is returned."""
+   work = [(filename, outputs, sink is not None) for filename, outputs, message in files]
+   results = convert_each_in_pool(modules, input_converter, output_converters, work, jobs)
+   failed = 0
+   for i, (printed, error, records) in enumerate(results):
+      print files[i][2]
+      sys.stdout.write(printed)
+      if error is not None:
+         failed += 1
+         sys.stdout.flush()
+         sys.stderr.write(error)
+      for record in records:
+         sink(record)
+      print
+      sys.stdout.flush()
+   return failed
+
+def report_failures(failed, num_files):
+   if failed:
+      print >>sys.stderr, "%d of %d files could not be converted." % (failed, num_files)
+      sys.exit(1)
+
 class convert:
    def __init__(self, modules, input_format, output_format, pre_callback=None, post_callback=None):
+      """Converts the input files.  With more than one process (see
+      --jobs), the files are converted by a pool of worker processes,
+      and a file that fails does not stop the others.  The callbacks
+      run in this process, so giving them converts one file at a
+      time."""
       assert isinstance(input_format, Format)
       assert isinstance(output_format, Format)
 
       config.add_option("-o", "--output", action="store", help="Output file")
       config.add_option("", "--gzip", action="store_true", help="Save output as gzip compressed file")
       config.add_option("", "--bzip2", action="store_true", help="Save output as bzip2 compressed file")
+      add_stats_option()
+      add_jobs_option()
 
       options = self.get_options(input_format, output_format)
 
       converter = ConverterGraph(modules)
       steps = converter.get_steps(input_format.converter, output_format.converter)
+      sink = get_stats_sink(options)
+
+      jobs = get_jobs(options, len(self.input_files))
+      if jobs > 1 and pre_callback is None and post_callback is None:
+         files = []
+         for filename in self.input_files:
+            output = splitext(filename)[0] + "." + output_format.ext
+            files.append((filename, output, "Converting '%s' to '%s'..." %
+                          (split(filename)[1], split(output)[1])))
+         failed = convert_in_pool(modules, input_format.converter, [output_format.converter],
+                                  files, jobs, sink)
+         if sink is not None:
+            sink.close()
+         report_failures(failed, len(files))
+         return
 
       for filename in self.input_files:
          if self.output_file:
@@ -66,10 +246,13 @@ class convert:
          if pre_callback:
             pre_callback(options, filename, output)
          converter.run_steps(
-            steps, filename, filename=output, progress_callback=progress_callback)
+            steps, filename, filename=output, progress_callback=progress_callback,
+            sink=sink)
          if post_callback:
             post_callback(options, filename, output)
          print
+      if sink is not None:
+         sink.close()
 
    def get_options(self, input_format, output_format):
       pretty_from = "%s (.%s)" % (input_format.name, input_format.ext)
@@ -86,25 +269,106 @@ class convert:
          self.input_files.extend(glob(arg))
       if not len(self.input_files):
          config.error("Cannot find input file(s) '%s'" % " ".join(args))
-      if options.output != "":
+      self.output_file = None
+      if options.output:
          if len(self.input_files) != 1:
             config.error("Cannot specify an output file when converting multiple files.")
          self.output_file = options.output
 
-      if options.gzip and options.bzip:
+      if options.gzip and options.bzip2:
          config.error("Can only specify one of --gzip or --bzip2.")
       if options.gzip:
          output_format.ext += ".gz"
-         if not self.output_file.endswith(".gz"):
+         if self.output_file and not self.output_file.endswith(".gz"):
             self.output_file += ".gz"
       elif options.bzip2:
          output_format.ext += ".bz2"
-         if not self.output_file.endswith(".bz2"):
+         if self.output_file and not self.output_file.endswith(".bz2"):
             self.output_file += ".bz2"
       return options
 
+class convert_many:
+   def __init__(self, modules, input_format, output_formats):
+      """Converts each input file to all of the output formats in one
+      pass, so that the file is read, and each format on the way to
+      more than one output is made, only once.  The files are spread
+      across processes as for convert.  Either way, a file that fails
+      does not stop the others."""
+      assert isinstance(input_format, Format)
+      for output_format in output_formats:
+         assert isinstance(output_format, Format)
+
+      pretty_from = "%s (.%s)" % (input_format.name, input_format.ext)
+      pretty_to = ", ".join(["%s (.%s)" % (x.name, x.ext) for x in output_formats])
+      config.usage = "\nConvert from %s to %s\n" % (pretty_from, pretty_to)
+      config.usage += "usage: %prog [options] input_file ..."
+      add_stats_option()
+      add_jobs_option()
+      (options, args) = config.parse_args()
+
+      if len(args) < 1:
+         config.error("No input file(s) specified")
+      input_files = []
+      for arg in args:
+         input_files.extend(glob(arg))
+      if not len(input_files):
+         config.error("Cannot find input file(s) '%s'" % " ".join(args))
+
+      output_converters = [x.converter for x in output_formats]
+      converter = get_converter_graph(modules)
+      steps = plan_conversion(converter, input_format.converter, output_converters)
+      sink = get_stats_sink(options)
+
+      files = []
+      for filename in input_files:
+         outputs = {}
+         for output_format in output_formats:
+            outputs[output_format.converter] = {
+               "filename": splitext(filename)[0] + "." + output_format.ext}
+         files.append((filename, outputs, "Converting '%s' to %s..." % (
+            split(filename)[1],
+            ", ".join(["'%s'" % split(x["filename"])[1] for x in outputs.values()]))))
+
+      jobs = get_jobs(options, len(files))
+      if jobs > 1:
+         failed = convert_in_pool(modules, input_format.converter, output_converters,
+                                  files, jobs, sink)
+      else:
+         failed = 0
+         for filename, outputs, message in files:
+            print message
+            sys.stdout.flush()
+            try:
+               run_conversion(converter, steps, filename, outputs, progress_callback, sink)
+            except KeyboardInterrupt:
+               raise
+            except:
+               # As in a worker process, a file that fails does not
+               # stop the others (ParseError is an old-style class)
+               failed += 1
+               sys.stdout.flush()
+               traceback.print_exc()
+            print
+      if sink is not None:
+         sink.close()
+      report_failures(failed, len(files))
+
 class test:
    def __init__(self, modules, test_dir, tests, groundtruth=False, callback=None):
+      """Converts the files of each test and compares them with the
+      groundtruth.  Each test is (directory, input format, output
+      format, title, description), followed optionally by a
+      dictionary of how to convert the files:
+
+        tree_cache: True to convert them twice, the second time from
+                    a cache of the trees parsed the first time
+        jobs:       the number of worker processes to convert them in
+        server:     True to convert them by sending them to a server
+                    (see pyScore.util.server) with two workers
+        timeout:    the server's timeout, in seconds
+
+      A file that should fail has the last line of its traceback, as
+      <name>.err, in the groundtruth."""
       config.add_option("", "--doc", action="store", help="Output directory")
       config.usage = "\nusage: \%prog [options] [test_directory]"
       (options, args) = config.parse_args()
@@ -129,7 +393,13 @@ class test:
       groundtruth_failures = []
       groundtruth_not_available = []
       errors = []
-      for dir, input_format, output_format, title, description in tests:
+      problems = []
+      for test in tests:
+         dir, input_format, output_format, title, description = test[:5]
+         if len(test) > 5:
+            test_options = test[5]
+         else:
+            test_options = {}
          root_dir, input_dir, output_dir, gt_dir = self.get_test_directories(test_dir, dir, groundtruth)
          assert isinstance(input_format, Format)
          assert isinstance(output_format, Format)
@@ -139,19 +409,38 @@ class test:
             self.doc_section(title, description)
          files = glob(join(input_dir, "*." + input_format.ext))
          files.sort()
+         work = []
          for filename in files:
+            root_filename = splitext(split(filename)[1])[0]
+            work.append((filename, join(output_dir, root_filename + "." + output_format.ext)))
+         if test_options.get("tree_cache"):
+            failures = self.convert_with_tree_cache(
+               converter, steps, work, output_dir, problems)
+         elif test_options.get("server"):
+            failures = self.convert_through_server(
+               modules, input_format, output_format, work,
+               test_options.get("timeout"), problems)
+         elif test_options.get("jobs", 1) > 1:
+            failures = self.convert_in_pool(
+               modules, input_format, output_format, work, test_options["jobs"])
+         else:
+            failures = self.convert_serially(converter, steps, work)
+         for (filename, out_file), failure in izip(work, failures):
             root_filename = splitext(split(filename)[1])[0]
             documentation_header = root_filename
-            out_file = join(output_dir, root_filename + "." + output_format.ext)
-            print "Converting '%s' to '%s'..." % (split(filename)[1], split(out_file)[1])
-            sys.stdout.flush()
-            try:
-               converter.run_steps(steps, filename, filename=out_file, progress_callback=progress_callback)
-            except Exception, e:
-               errors.append("Exception from '%s':\n\n" % filename)
-               errors.extend(traceback.format_exception(*sys.exc_info()))
-               errors.append("\n")
+            gt_error_file = join(gt_dir, root_filename + ".err")
+            if failure is not None:
                documentation_header += " (E)"
+               if groundtruth and isfile(gt_error_file):
+                  error_file = join(output_dir, root_filename + ".err")
+                  self.write_error(error_file, failure)
+                  if not self.compare_files(error_file, gt_error_file):
+                     groundtruth_failures.append(error_file)
+                     documentation_header += " (G)"
+               else:
+                  errors.append("Exception from '%s':\n\n" % filename)
+                  errors.append(failure)
+                  errors.append("\n")
             else:
                if callback:
                   callback(filename, out_file)
@@ -161,12 +450,15 @@ class test:
                      if not self.compare_files(out_file, gt_file):
                         groundtruth_failures.append(out_file)
                         documentation_header += " (G)"
+                  elif isfile(gt_error_file):
+                     # It should have failed
+                     groundtruth_failures.append(out_file)
+                     documentation_header += " (G)"
                   else:
                      groundtruth_not_available.append(out_file)
                      documentation_header += " (U)"
             if make_documentation:
                self.doc_result(documentation_header, filename, out_file)
-            print
       if len(errors):
          print textwrap.fill("ERROR: The following files caused exceptions during conversion:")
          print "".join(errors)
@@ -176,6 +468,130 @@ class test:
       if len(groundtruth_failures):
          print textwrap.fill("WARNING: The following files failed the groundtruth check:")
          print textwrap.fill(", ".join(groundtruth_failures))
+      if len(problems):
+         print "ERROR: " + "\nERROR: ".join(problems)
+
+   def convert_serially(self, converter, steps, work):
+      """Converts each (filename, out_file) in work, returning the
+      traceback of each one that failed, or None."""
+      failures = []
+      for filename, out_file in work:
+         print "Converting '%s' to '%s'..." % (split(filename)[1], split(out_file)[1])
+         sys.stdout.flush()
+         try:
+            converter.run_steps(steps, filename, filename=out_file, progress_callback=progress_callback)
+         except:
+            failures.append("".join(traceback.format_exception(*sys.exc_info())))
+         else:
+            failures.append(None)
+         print
+      return failures
+
+   def convert_in_pool(self, modules, input_format, output_format, work, jobs):
+      """Converts the files across 'jobs' worker processes."""
+      results = convert_each_in_pool(
+         modules, input_format.converter, [output_format.converter],
+         [(filename, out_file, False) for filename, out_file in work], jobs)
+      failures = []
+      for i, (printed, error, records) in enumerate(results):
+         filename, out_file = work[i]
+         print "Converting '%s' to '%s'..." % (split(filename)[1], split(out_file)[1])
+         sys.stdout.write(printed)
+         failures.append(error)
+         print
+      return failures
+
+   def convert_through_server(self, modules, input_format, output_format, work,
+                              timeout, problems):
+      """Sends the files to a server in this process.  A file that
+      cannot be converted fails with the traceback the server sends
+      back, and one refused for another reason with the status."""
+      from pyScore.util.server import Conversions, ConversionRequestHandler, ThreadingHTTPServer
+      class QuietRequestHandler(ConversionRequestHandler):
+         def log_message(self, format, *args):
+            pass
+      options = Values({"jobs": 2, "backlog": None, "timeout": timeout, "max_size": None})
+      conversions = Conversions(modules, [input_format, output_format], options)
+      try:
+         server = ThreadingHTTPServer(("127.0.0.1", 0), QuietRequestHandler)
+         server.conversions = conversions
+         thread = threading.Thread(target=server.serve_forever)
+         thread.setDaemon(True)
+         thread.start()
+         path = "/convert?" + urlencode(
+            [("from", input_format.name), ("to", output_format.name)])
+         failures = []
+         for filename, out_file in work:
+            print "Converting '%s' to '%s'..." % (split(filename)[1], split(out_file)[1])
+            connection = HTTPConnection(*server.server_address)
+            try:
+               connection.request("POST", path, open(filename, "rb").read())
+               response = connection.getresponse()
+               body = response.read()
+            finally:
+               connection.close()
+            if response.status == 200:
+               fd = open(out_file, "wb")
+               try:
+                  fd.write(body)
+               finally:
+                  fd.close()
+               failures.append(None)
+            elif response.status == 422:
+               failures.append(body)
+            else:
+               failures.append("%d %s\n" % (response.status, response.reason))
+            print
+         server.shutdown()
+         server.server_close()
+         # A conversion that timed out keeps its place and its files
+         # until its worker is done
+         for i in range(300):
+            if not conversions.get_busy():
+               break
+            time.sleep(0.1)
+         if conversions.get_busy() or len(os.listdir(conversions.directory)):
+            problems.append("The server did not give back the places and files of the requests for '%s'." %
+                            split(split(work[0][0])[0])[0])
+      finally:
+         conversions.close()
+      return failures
+
+   def write_error(self, filename, failure):
+      # The last line of the traceback, which names the error
+      fd = open(filename, "w")
+      try:
+         fd.write(failure.rstrip().splitlines()[-1] + "\n")
+      finally:
+         fd.close()
+
+   def convert_with_tree_cache(self, converter, steps, work, output_dir, problems):
+      """Converts the files once to fill a new tree cache, and then
+      again with the trees from it."""
+      from pyScore.Guido.convert import get_tree_cache
+      directory = join(output_dir, "tree_cache")
+      shutil.rmtree(directory, True)
+      config.set("tree_cache", directory)
+      try:
+         stdout = sys.stdout
+         sys.stdout = StringIO()
+         try:
+            self.convert_serially(converter, steps, work)
+         finally:
+            sys.stdout = stdout
+         cache = get_tree_cache()
+         hits = cache.hits
+         failures = self.convert_serially(converter, steps, work)
+         hits = cache.hits - hits
+      finally:
+         config.set("tree_cache", None)
+         shutil.rmtree(directory, True)
+      # A file that fails may do so before its tree is parsed
+      converted = len([x for x in failures if x is None])
+      if hits < converted:
+         problems.append("Only %d of the %d files in '%s' were converted from the tree cache." %
+                         (hits, converted, split(output_dir)[0]))
+      return failures
 
    def get_test_directories(self, test_dir, dir, groundtruth):
       root_dir = join(test_dir, dir)
@@ -260,4 +676,59 @@ class test:
          j += 1
       return True
 
-__all__ = "test convert Format".split()
+class lint:
+   def __init__(self, module, input_format):
+      """Checks the input files (or the files with the input format's
+      extension in the given directories) with the module's
+      lint_<format>_files function, printing the problems found and
+      writing the module's summary of them to the output file (or
+      stdout)."""
+      assert isinstance(input_format, Format)
+      config.add_option("-o", "--output", action="store", help="Summary file")
+      add_jobs_option(default=0)
+      pretty_from = "%s (.%s)" % (input_format.name, input_format.ext)
+      config.usage = "\nCheck %s files for problems\n" % pretty_from
+      config.usage += "usage: %prog [options] input_file_or_directory ..."
+      (options, args) = config.parse_args()
+
+      input_files = self.get_input_files(args, input_format.ext)
+      if not len(input_files):
+         config.error("Cannot find input file(s) '%s'" % " ".join(args))
+
+      # The summary may go to stdout, so the rest goes to stderr
+      lint_files = getattr(module, "lint_%s_files" % input_format.name)
+      results = []
+      failed = 0
+      for result in lint_files(input_files, get_jobs(options, len(input_files), default=0)):
+         if not result.is_ok():
+            failed += 1
+            for line in result.format():
+               print >>sys.stderr, line
+         elif options.verbose:
+            print >>sys.stderr, "%s: OK" % result.filename
+         results.append(result)
+      print >>sys.stderr, "%d of %d files have problems." % (failed, len(results))
+
+      if options.output:
+         fd = open(options.output, "w")
+         module.write_summary(results, fd)
+         fd.close()
+      else:
+         module.write_summary(results, sys.stdout)
+      if failed:
+         sys.exit(1)
+
+   def get_input_files(self, args, ext):
+      input_files = []
+      for arg in args:
+         if isdir(arg):
+            for dirpath, dirnames, filenames in os.walk(arg):
+               dirnames.sort()
+               filenames.sort()
+               input_files.extend([join(dirpath, x) for x in filenames
+                                   if x.endswith("." + ext)])
+         else:
+            input_files.extend(glob(arg))
+      return input_files
+
+__all__ = "test convert convert_many lint Format".split()
@@ -0,0 +1,522 @@
+"""
+A long-running server that converts files sent to it over HTTP
+
+Copyright (c) 2002-2008 Michael Droettboom
+"""
+## This program is free software; you can redistribute it and/or
+## modify it under the terms of the GNU General Public License
+## as published by the Free Software Foundation; either version 2
+## of the License, or (at your option) any later version.
+
+## This program is distributed in the hope that it will be useful,
+## but WITHOUT ANY WARRANTY; without even the implied warranty of
+## MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+## GNU General Public License for more details.
+
+## You should have received a copy of the GNU General Public License
+## along with this program; if not, write to the Free Software
+## Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+
+# Each of the scripts imports the converters, reads the options and
+# the configuration files and builds the tag registry before it
+# converts anything.  The server does that once, and then converts
+# whatever it is sent, over HTTP on a port of localhost or on a Unix
+# socket:
+#
+#   GET  /formats   the names of the formats, one per line
+#
+#   POST /convert?from=Guido&to=MusicXML[&to=MIDI ...][&option=value ...]
+#                   converts the body of the request.  With one 'to',
+#                   the response is the converted file; with more, it
+#                   is multipart/mixed, with a part for each format in
+#                   the order they were asked for.  The other
+#                   parameters are converter options (such as
+#                   measures=2-5 or ticks_per_beat=480), which apply
+#                   to that request only.
+#
+# The conversions run in a pool of worker processes, forked once
+# everything is loaded.  Requests beyond what the workers and the
+# backlog can take are refused with 503.  Other errors are 400 (bad
+# parameters), 404, 411 (no Content-Length), 413 (too large), 422 (the
+# file could not be converted; the body is the traceback) and 504 (the
+# conversion took longer than --timeout).  For example:
+#
+#   curl --data-binary @song.gmn 'http://localhost:8570/convert?from=Guido&to=MIDI' > song.mid
+
+from pyScore.config import config
+from pyScore.convert import get_converter_graph, dummy_function
+from pyScore.util.script_helpers import Format, add_jobs_option, get_jobs, plan_conversion, run_conversion
+from pyScore.__version__ import version
+
+try:
+   import multiprocessing
+except ImportError:
+   multiprocessing = None
+
+from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+from SocketServer import ThreadingMixIn, UnixStreamServer
+from StringIO import StringIO
+from cgi import parse_qs
+from mimetools import choose_boundary
+from os.path import join, exists, getsize
+from tempfile import mkdtemp
+import os
+import shutil
+import signal
+import sys
+import threading
+import traceback
+
+config.add_option("", "--port", action="store", type="int",
+                  help="[server] The port of localhost to listen on (default: 8570)")
+config.add_option("", "--socket", action="store",
+                  help="[server] Listen on this Unix socket instead of a port")
+config.add_option("", "--backlog", action="store", type="int",
+                  help="[server] Number of requests that may wait for a worker (default: 16)")
+config.add_option("", "--timeout", action="store", type="float",
+                  help="[server] Seconds a conversion may take (default: 300)")
+config.add_option("", "--max-size", action="store", type="int",
+                  help="[server] The largest file that may be sent, in megabytes (default: 64)")
+
+DEFAULT_PORT = 8570
+DEFAULT_BACKLOG = 16
+DEFAULT_TIMEOUT = 300
+DEFAULT_MAX_SIZE = 64
+
+BLOCK_SIZE = 1 << 16
+
+# The options a request may set.  The others are the server's (or,
+# like --tree-cache, name files on the server).
+request_options = """
+measures divisions ticks_per_beat midi_format xml_encoding dtd
+guido_encoding predictive_parser
+""".split()
+
+content_types = {"gmn": "text/plain",
+                 "ly": "text/plain",
+                 "xml": "application/xml",
+                 "mid": "audio/midi"}
+
+# Converted by every output format before the workers are forked, so
+# that anything the converters load the first time they are used is
+# loaded once
+WARM_UP_SCORE = '[ \\clef<"treble"> \\key<"G"> \\meter<"4/4"> c1/4 d e f | {c/2, e, g} _/2 ]'
+
+class RequestError(ValueError):
+   pass
+
+# The ConverterGraph, planned steps and default options of a worker
+# process
+_worker = None
+
+def _init_worker(module_names):
+   global _worker
+   # Interrupting the server stops the workers with the pool, not in
+   # the middle of taking a request from it
+   signal.signal(signal.SIGINT, signal.SIG_IGN)
+   modules = []
+   for name in module_names:
+      __import__(name)
+      modules.append(sys.modules[name])
+   defaults = config.parse_args()[0].__dict__.copy()
+   _worker = (get_converter_graph(modules), {}, defaults)
+
+def _convert_in_worker(job):
+   """Converts one request in a worker process.  Returns what the
+   conversion printed and the traceback if it failed."""
+   input_file, input_converter, outputs, options = job
+   converter, plans, defaults = _worker
+   # Options set by an earlier request are put back first
+   values = config.parse_args()[0]
+   values.__dict__.clear()
+   values.__dict__.update(defaults)
+   for dest, value in options:
+      setattr(values, dest, value)
+
+   output_converters = tuple([x[0] for x in outputs])
+   key = (input_converter, output_converters)
+   if not plans.has_key(key):
+      plans[key] = plan_conversion(converter, input_converter, output_converters)
+   if len(outputs) == 1:
+      run_outputs = outputs[0][1]
+   else:
+      run_outputs = {}
+      for output_converter, filename in outputs:
+         run_outputs[output_converter] = {"filename": filename}
+
+   error = None
+   stdout, stderr = sys.stdout, sys.stderr
+   sys.stdout = sys.stderr = printed = StringIO()
+   try:
+      try:
+         run_conversion(converter, plans[key], input_file, run_outputs, dummy_function, None)
+      except:
+         # Not just Exception: ParseError is an old-style class, and a
+         # worker that raises never calls back, so the request would
+         # keep its place for good
+         error = "".join(traceback.format_exception(*sys.exc_info()))
+   finally:
+      sys.stdout, sys.stderr = stdout, stderr
+   return printed.getvalue(), error
+
+class Conversions:
+   """The formats, worker pool and limits of a server, shared by the
+   threads handling its requests."""
+   def __init__(self, modules, formats, options):
+      self.modules = modules
+      self.converter = get_converter_graph(modules)
+      self.formats = {}
+      self.format_names = []
+      for format in formats:
+         assert isinstance(format, Format)
+         self.formats[format.name.lower()] = format
+         self.format_names.append(format.name)
+      if options.timeout is None:
+         self.timeout = DEFAULT_TIMEOUT
+      else:
+         self.timeout = options.timeout
+      self.max_size = (options.max_size or DEFAULT_MAX_SIZE) << 20
+      jobs = get_jobs(options, default=0)
+      # A request holds its place from when its file starts arriving
+      # until its conversion is done (see ConversionJob)
+      self._places = threading.Semaphore(jobs + (options.backlog or DEFAULT_BACKLOG))
+      self._lock = threading.Lock()
+      self._busy = 0
+      # The files of each request are in a directory of their own in here
+      self.directory = mkdtemp(prefix="pyScore-server-")
+      self.warm_up(formats)
+      self.pool = multiprocessing.Pool(
+         jobs, _init_worker, ([module.__name__ for module in modules],))
+
+   def warm_up(self, formats):
+      if not self.converter.inputs.has_key("Guido_string"):
+         return
+      directory = mkdtemp(prefix="pyScore-")
+      stdout, stderr = sys.stdout, sys.stderr
+      sys.stdout = sys.stderr = StringIO()
+      try:
+         for format in formats:
+            try:
+               steps = self.converter.get_steps("Guido_string", format.converter)
+            except ValueError:
+               continue
+            self.converter.run_steps(
+               steps, WARM_UP_SCORE, filename=join(directory, "warm_up." + format.ext))
+      finally:
+         sys.stdout, sys.stderr = stdout, stderr
+         shutil.rmtree(directory, True)
+
+   def close(self):
+      self.pool.terminate()
+      self.pool.join()
+      shutil.rmtree(self.directory, True)
+
+   def get_format(self, name):
+      format = self.formats.get(name.lower())
+      if format is None:
+         raise RequestError("Unknown format '%s'." % name)
+      return format
+
+   def parse_params(self, params):
+      """Returns the input format, the output formats and the options
+      (dest, value) of the parameters of a request."""
+      params = params.copy()
+      inputs = params.pop("from", [])
+      if len(inputs) != 1:
+         raise RequestError("Give one input format with 'from'.")
+      input_format = self.get_format(inputs[0])
+      output_formats = []
+      for name in params.pop("to", []):
+         format = self.get_format(name)
+         if format in output_formats:
+            raise RequestError("The format '%s' is asked for twice." % name)
+         output_formats.append(format)
+      if not len(output_formats):
+         raise RequestError("Give at least one output format with 'to'.")
+      try:
+         plan_conversion(self.converter, input_format.converter,
+                         [x.converter for x in output_formats])
+      except ValueError, e:
+         raise RequestError(str(e))
+      return input_format, output_formats, self.parse_options(params)
+
+   def parse_options(self, params):
+      options = []
+      for name, values in params.items():
+         dest = name.replace("-", "_")
+         if dest not in request_options:
+            raise RequestError("The option '%s' can not be set by a request." % name)
+         option = config.get_option("--" + dest.replace("_", "-"))
+         if option is None:
+            raise RequestError("The option '%s' is not used by these converters." % name)
+         opt = option.get_opt_string()
+         value = values[-1]
+         if option.takes_value():
+            try:
+               value = option.check_value(opt, value)
+            except Exception, e:
+               raise RequestError(str(e))
+         else:
+            value = value.lower() in ("", "1", "true", "yes", "on")
+         if dest == "measures":
+            # Checked here, so that it is a bad request and not a
+            # failed conversion
+            from pyScore.util.range_checking import measure_range
+            try:
+               measure_range(value)
+            except ValueError, e:
+               raise RequestError(str(e))
+         options.append((dest, value))
+      return options
+
+   def acquire(self):
+      """Takes a place for a request, returning False if there are none
+      left."""
+      if not self._places.acquire(False):
+         return False
+      self._lock.acquire()
+      self._busy += 1
+      self._lock.release()
+      return True
+
+   def release(self):
+      self._lock.acquire()
+      self._busy -= 1
+      self._lock.release()
+      self._places.release()
+
+   def get_busy(self):
+      """Returns the number of places taken."""
+      return self._busy
+
+class ConversionJob:
+   """The place and the directory of files of a request that has got
+   a place.  Both the thread handling the request and the worker
+   converting it use them.  The place is given back once the worker
+   is done with it, since a conversion that times out keeps its worker
+   busy until it finishes.  The directory is removed once both are
+   done with it."""
+   def __init__(self, conversions):
+      self.conversions = conversions
+      self.directory = mkdtemp(prefix="request-", dir=conversions.directory)
+      self._lock = threading.Lock()
+      self._users = 1
+      self._converting = False
+
+   def convert(self, input_file, input_format, outputs, options):
+      """Converts input_file in a worker, to the (format, filename) in
+      outputs.  Returns what the conversion printed and the traceback
+      if it failed.  Raises multiprocessing.TimeoutError if it takes
+      too long."""
+      job = (input_file, input_format.converter,
+             [(format.converter, filename) for format, filename in outputs],
+             options)
+      self._lock.acquire()
+      self._users += 1
+      self._converting = True
+      self._lock.release()
+      result = self.conversions.pool.apply_async(
+         _convert_in_worker, (job,), callback=self._converted)
+      return result.get(self.conversions.timeout)
+
+   def _converted(self, result):
+      # Called in the pool's thread for results
+      self.conversions.release()
+      self._let_go()
+
+   def finish(self):
+      """Called by the thread handling the request once it is done."""
+      if not self._converting:
+         self.conversions.release()
+      self._let_go()
+
+   def _let_go(self):
+      self._lock.acquire()
+      self._users -= 1
+      done = self._users == 0
+      self._lock.release()
+      if done:
+         shutil.rmtree(self.directory, True)
+
+class ConversionRequestHandler(BaseHTTPRequestHandler):
+   server_version = "pyScore/" + version
+
+   def split_path(self):
+      if "?" in self.path:
+         path, query = self.path.split("?", 1)
+      else:
+         path, query = self.path, ""
+      return path, parse_qs(query, True)
+
+   def address_string(self):
+      # Without looking up the name of the host for every request
+      return self.client_address[0]
+
+   def send_text(self, code, text, message=None):
+      self.send_response(code, message)
+      self.send_header("Content-Type", "text/plain")
+      self.send_header("Content-Length", str(len(text)))
+      self.end_headers()
+      self.wfile.write(text)
+
+   def do_GET(self):
+      path, params = self.split_path()
+      if path != "/formats":
+         self.send_error(404)
+         return
+      self.send_text(200, "".join(
+         [x + "\n" for x in self.server.conversions.format_names]))
+
+   def do_POST(self):
+      conversions = self.server.conversions
+      path, params = self.split_path()
+      if path != "/convert":
+         self.send_error(404)
+         return
+      try:
+         input_format, output_formats, options = conversions.parse_params(params)
+      except RequestError, e:
+         self.send_error(400, str(e))
+         return
+      try:
+         length = int(self.headers.getheader("content-length"))
+      except (TypeError, ValueError):
+         self.send_error(411)
+         return
+      if length > conversions.max_size:
+         self.send_error(413)
+         return
+      if not conversions.acquire():
+         self.send_error(503, "All of the workers are busy")
+         return
+
+      job = ConversionJob(conversions)
+      try:
+         input_file = join(job.directory, "input." + input_format.ext)
+         outputs = []
+         for i, format in enumerate(output_formats):
+            outputs.append((format, join(job.directory, "output%d.%s" % (i, format.ext))))
+         self.read_body(input_file, length)
+         try:
+            printed, error = job.convert(input_file, input_format, outputs, options)
+         except multiprocessing.TimeoutError:
+            self.send_error(504, "The conversion took too long")
+            return
+         for line in printed.splitlines():
+            self.log_message("%s", line)
+         if error is not None:
+            self.send_text(422, error, "The file could not be converted")
+         elif len(outputs) == 1:
+            self.send_file(*outputs[0])
+         else:
+            self.send_files(outputs)
+      finally:
+         job.finish()
+
+   def read_body(self, filename, length):
+      fd = open(filename, "wb")
+      try:
+         while length > 0:
+            block = self.rfile.read(min(length, BLOCK_SIZE))
+            if not block:
+               break
+            fd.write(block)
+            length -= len(block)
+      finally:
+         fd.close()
+
+   def write_file(self, filename):
+      fd = open(filename, "rb")
+      try:
+         block = fd.read(BLOCK_SIZE)
+         while block:
+            self.wfile.write(block)
+            block = fd.read(BLOCK_SIZE)
+      finally:
+         fd.close()
+
+   def get_content_type(self, format):
+      return content_types.get(format.ext, "application/octet-stream")
+
+   def send_file(self, format, filename):
+      self.send_response(200)
+      self.send_header("Content-Type", self.get_content_type(format))
+      self.send_header("Content-Disposition", 'attachment; filename="output.%s"' % format.ext)
+      self.send_header("Content-Length", str(getsize(filename)))
+      self.end_headers()
+      self.write_file(filename)
+
+   def send_files(self, outputs):
+      """Sends each of the outputs as a part of a multipart/mixed
+      response, a block at a time."""
+      boundary = choose_boundary()
+      heads = []
+      length = len("--%s--\r\n" % boundary)
+      for format, filename in outputs:
+         head = ('--%s\r\nContent-Type: %s\r\n'
+                 'Content-Disposition: attachment; name="%s"; filename="output.%s"\r\n\r\n' %
+                 (boundary, self.get_content_type(format), format.name, format.ext))
+         heads.append(head)
+         length += len(head) + getsize(filename) + 2
+      self.send_response(200)
+      self.send_header("Content-Type", 'multipart/mixed; boundary="%s"' % boundary)
+      self.send_header("Content-Length", str(length))
+      self.end_headers()
+      for head, (format, filename) in zip(heads, outputs):
+         self.wfile.write(head)
+         self.write_file(filename)
+         self.wfile.write("\r\n")
+      self.wfile.write("--%s--\r\n" % boundary)
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+   daemon_threads = True
+
+class ThreadingUnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+   daemon_threads = True
+
+   def get_request(self):
+      # Clients of a Unix socket have no address
+      request, client_address = UnixStreamServer.get_request(self)
+      return request, ("local", 0)
+
+def _stop(signum, frame):
+   raise SystemExit()
+
+class serve:
+   def __init__(self, modules, formats):
+      """Serves conversions between the formats until interrupted."""
+      config.usage = "\nConvert files sent over HTTP, on a port of localhost or a Unix socket\n"
+      config.usage += "usage: %prog [options]"
+      add_jobs_option(default=0)
+      (options, args) = config.parse_args()
+      if len(args):
+         config.error("The server does not take any arguments.")
+      if multiprocessing is None:
+         config.error("The server requires the multiprocessing module.")
+
+      conversions = Conversions(modules, formats, options)
+      try:
+         if options.socket:
+            if exists(options.socket):
+               os.remove(options.socket)
+            server = ThreadingUnixHTTPServer(options.socket, ConversionRequestHandler)
+            where = options.socket
+         else:
+            port = options.port or DEFAULT_PORT
+            server = ThreadingHTTPServer(("127.0.0.1", port), ConversionRequestHandler)
+            where = "http://localhost:%d/" % port
+         server.conversions = conversions
+         print "Converting %s on %s" % (", ".join(conversions.format_names), where)
+         sys.stdout.flush()
+         signal.signal(signal.SIGTERM, _stop)
+         try:
+            server.serve_forever()
+         except (KeyboardInterrupt, SystemExit):
+            pass
+         server.server_close()
+         if options.socket and exists(options.socket):
+            os.remove(options.socket)
+      finally:
+         conversions.close()
+
+__all__ = "serve Conversions ConversionJob".split()
@@ -65,7 +65,7 @@ data_files.append((join(lib_path, "pyScore"), [join("pyScore", "pyScore.cfg")]))
 if "--no-compiler" in sys.argv:
    extensions = []
 else:
-   extensions = [Extension("pyScore.util.crat", ["src/crat/cratmodule.c"],
+   extensions = [Extension("pyScore.util._rational", ["src/rational/rationalmodule.c"],
                            define_macros=[('NDEBUG', 1)])]
 
 setup(name = "pyScore",
@@ -0,0 +1,1411 @@
+/*
+  Exact rational numbers for pyScore
+  Python GUIDO tools
+
+  Copyright (c) 2002-2008 Michael Droettboom
+
+  This program is free software; you can redistribute it and/or
+  modify it under the terms of the GNU General Public License
+  as published by the Free Software Foundation; either version 2
+  of the License, or (at your option) any later version.
+
+  This program is distributed in the hope that it will be useful,
+  but WITHOUT ANY WARRANTY; without even the implied warranty of
+  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+  GNU General Public License for more details.
+
+  You should have received a copy of the GNU General Public License
+  along with this program; if not, write to the Free Software
+  Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+*/
+
+/*
+  A drop-in replacement for the pure Python pyScore.util.Rat.Rat,
+  written against the stable parts of the CPython API, so it builds
+  on Python 2.4 and later, including Python 3.
+
+  Values are always kept in lowest terms with a positive denominator.
+  When the numerator and denominator fit in a C long long they are
+  stored directly; otherwise they are stored as Python integers.  When
+  both operands of an arithmetic operation fit in 32 bits, it is done
+  entirely in C (the intermediate products can not overflow 64 bits),
+  using Knuth's forms of addition and multiplication, which keep the
+  gcd's small and skip them when the result is known to be in lowest
+  terms already.  Everything else goes through Python integers.
+*/
+
+#include "Python.h"
+#include "structmember.h"
+
+#if PY_MAJOR_VERSION >= 3
+#define IS_PY3K
+#endif
+
+#if PY_VERSION_HEX < 0x03020000
+typedef long Py_hash_t;
+#endif
+
+#if PY_VERSION_HEX < 0x02050000
+typedef int Py_ssize_t;
+#endif
+
+#ifndef Py_TYPE
+#define Py_TYPE(ob) (((PyObject*)(ob))->ob_type)
+#endif
+
+#ifndef PyVarObject_HEAD_INIT
+#define PyVarObject_HEAD_INIT(type, size) PyObject_HEAD_INIT(type) size,
+#endif
+
+#ifdef IS_PY3K
+#define IS_INTEGER(o) PyLong_Check(o)
+#define TP_FLAGS Py_TPFLAGS_DEFAULT
+#else
+#define IS_INTEGER(o) (PyInt_Check(o) || PyLong_Check(o))
+#define TP_FLAGS (Py_TPFLAGS_DEFAULT | Py_TPFLAGS_CHECKTYPES)
+#endif
+
+/* Operands whose numerator and denominator are within this magnitude
+   are handled in C */
+#define SMALL_MAX 0x7fffffffLL
+#define IS_SMALL_VALUE(x) ((x) <= SMALL_MAX && (x) >= -SMALL_MAX)
+
+typedef struct {
+    PyObject_HEAD
+    /* Used when big_num is NULL */
+    PY_LONG_LONG num;
+    PY_LONG_LONG den;
+    /* Python integers, used when the value doesn't fit in num and den */
+    PyObject *big_num;
+    PyObject *big_den;
+    /* -1 until it is first computed */
+    Py_hash_t hash;
+} RatObject;
+
+static PyTypeObject RatType;
+
+#define Rat_Check(o) PyObject_TypeCheck(o, &RatType)
+#define IS_SMALL(r) ((r)->big_num == NULL && \
+                     IS_SMALL_VALUE((r)->num) && IS_SMALL_VALUE((r)->den))
+
+/* A rational operand: either small (num and den are set) or big
+   (big_num and big_den are new references) */
+typedef struct {
+    int small;
+    PY_LONG_LONG num;
+    PY_LONG_LONG den;
+    PyObject *big_num;
+    PyObject *big_den;
+} Parts;
+
+static void
+parts_clear(Parts *p)
+{
+    Py_XDECREF(p->big_num);
+    Py_XDECREF(p->big_den);
+    p->big_num = p->big_den = NULL;
+}
+
+/********************************************************************
+ Integer helpers
+*/
+
+static PY_LONG_LONG
+gcd_ll(PY_LONG_LONG a, PY_LONG_LONG b)
+{
+    PY_LONG_LONG t;
+    if (a < 0)
+        a = -a;
+    if (b < 0)
+        b = -b;
+    while (b) {
+        t = a % b;
+        a = b;
+        b = t;
+    }
+    return a;
+}
+
+static PyObject *
+int_from_ll(PY_LONG_LONG x)
+{
+#ifndef IS_PY3K
+    if (x >= LONG_MIN && x <= LONG_MAX)
+        return PyInt_FromLong((long)x);
+#endif
+    return PyLong_FromLongLong(x);
+}
+
+/* Returns 1 and sets *x if o (a Python integer) fits in a long long,
+   0 if it doesn't, and -1 on error */
+static int
+int_as_ll(PyObject *o, PY_LONG_LONG *x)
+{
+    int overflow;
+#ifndef IS_PY3K
+    if (PyInt_Check(o)) {
+        *x = PyInt_AS_LONG(o);
+        return 1;
+    }
+#endif
+    *x = PyLong_AsLongLongAndOverflow(o, &overflow);
+    if (*x == -1 && PyErr_Occurred())
+        return -1;
+    return !overflow;
+}
+
+static PyObject *
+gcd_obj(PyObject *a, PyObject *b)
+{
+    PyObject *t;
+    int is_zero;
+
+    a = PyNumber_Absolute(a);
+    if (a == NULL)
+        return NULL;
+    b = PyNumber_Absolute(b);
+    if (b == NULL) {
+        Py_DECREF(a);
+        return NULL;
+    }
+    for (;;) {
+        is_zero = !PyObject_IsTrue(b);
+        if (is_zero)
+            break;
+        t = PyNumber_Remainder(a, b);
+        Py_DECREF(a);
+        if (t == NULL) {
+            Py_DECREF(b);
+            return NULL;
+        }
+        a = b;
+        b = t;
+    }
+    Py_DECREF(b);
+    return a;
+}
+
+/********************************************************************
+ Construction
+*/
+
+static RatObject *
+rat_alloc(PyTypeObject *type)
+{
+    RatObject *r = (RatObject *)type->tp_alloc(type, 0);
+    if (r != NULL) {
+        r->num = 0;
+        r->den = 1;
+        r->big_num = r->big_den = NULL;
+        r->hash = -1;
+    }
+    return r;
+}
+
+/* num/den must already be in lowest terms with den > 0 */
+static PyObject *
+rat_from_reduced_ll(PY_LONG_LONG num, PY_LONG_LONG den)
+{
+    RatObject *r = rat_alloc(&RatType);
+    if (r == NULL)
+        return NULL;
+    r->num = num;
+    r->den = den;
+    return (PyObject *)r;
+}
+
+/* Reduces num/den; both must be within SMALL_MAX */
+static PyObject *
+rat_from_ll(PY_LONG_LONG num, PY_LONG_LONG den)
+{
+    PY_LONG_LONG g;
+    if (den == 0) {
+        PyErr_SetString(PyExc_ZeroDivisionError, "Rat(x, 0)");
+        return NULL;
+    }
+    if (den < 0) {
+        num = -num;
+        den = -den;
+    }
+    g = gcd_ll(num, den);
+    if (g > 1) {
+        num /= g;
+        den /= g;
+    }
+    return rat_from_reduced_ll(num, den);
+}
+
+/* Reduces num/den (Python integers); borrows both references */
+static PyObject *
+rat_from_objects(PyTypeObject *type, PyObject *num, PyObject *den)
+{
+    RatObject *r;
+    PyObject *g, *zero, *t;
+    PY_LONG_LONG n, d;
+    int cmp, fits;
+
+    zero = int_from_ll(0);
+    if (zero == NULL)
+        return NULL;
+    cmp = PyObject_RichCompareBool(den, zero, Py_EQ);
+    if (cmp == 1) {
+        PyErr_SetString(PyExc_ZeroDivisionError, "Rat(x, 0)");
+    }
+    if (cmp != 0) {
+        Py_DECREF(zero);
+        return NULL;
+    }
+    cmp = PyObject_RichCompareBool(den, zero, Py_LT);
+    Py_DECREF(zero);
+    if (cmp == -1)
+        return NULL;
+
+    g = gcd_obj(num, den);
+    if (g == NULL)
+        return NULL;
+    if (cmp) {
+        /* Make the denominator positive */
+        t = PyNumber_Negative(g);
+        Py_DECREF(g);
+        if (t == NULL)
+            return NULL;
+        g = t;
+    }
+    num = PyNumber_FloorDivide(num, g);
+    if (num == NULL) {
+        Py_DECREF(g);
+        return NULL;
+    }
+    den = PyNumber_FloorDivide(den, g);
+    Py_DECREF(g);
+    if (den == NULL) {
+        Py_DECREF(num);
+        return NULL;
+    }
+
+    r = rat_alloc(type);
+    if (r == NULL)
+        goto error;
+    fits = int_as_ll(num, &n);
+    if (fits == 1)
+        fits = int_as_ll(den, &d);
+    if (fits == -1) {
+        Py_DECREF(r);
+        goto error;
+    }
+    if (fits) {
+        r->num = n;
+        r->den = d;
+        Py_DECREF(num);
+        Py_DECREF(den);
+    } else {
+        r->big_num = num;
+        r->big_den = den;
+    }
+    return (PyObject *)r;
+
+  error:
+    Py_DECREF(num);
+    Py_DECREF(den);
+    return NULL;
+}
+
+/********************************************************************
+ Operands
+*/
+
+/* Fills in p from o.  Returns 1 if o is rational (a Rat or an
+   integer), 0 if it isn't, and -1 on error. */
+static int
+get_parts(PyObject *o, Parts *p)
+{
+    int fits;
+    p->big_num = p->big_den = NULL;
+    if (Rat_Check(o)) {
+        RatObject *r = (RatObject *)o;
+        if (r->big_num == NULL) {
+            p->num = r->num;
+            p->den = r->den;
+            p->small = IS_SMALL_VALUE(p->num) && IS_SMALL_VALUE(p->den);
+            return 1;
+        }
+        p->small = 0;
+        Py_INCREF(r->big_num);
+        Py_INCREF(r->big_den);
+        p->big_num = r->big_num;
+        p->big_den = r->big_den;
+        return 1;
+    }
+    if (IS_INTEGER(o)) {
+        fits = int_as_ll(o, &p->num);
+        if (fits == -1)
+            return -1;
+        p->den = 1;
+        if (fits) {
+            p->small = IS_SMALL_VALUE(p->num);
+        } else {
+            p->small = 0;
+            Py_INCREF(o);
+            p->big_num = o;
+            p->big_den = int_from_ll(1);
+            if (p->big_den == NULL) {
+                parts_clear(p);
+                return -1;
+            }
+        }
+        return 1;
+    }
+    return 0;
+}
+
+/* Makes sure big_num and big_den are set */
+static int
+parts_make_big(Parts *p)
+{
+    if (p->big_num != NULL)
+        return 0;
+    p->big_num = int_from_ll(p->num);
+    p->big_den = int_from_ll(p->den);
+    if (p->big_num == NULL || p->big_den == NULL) {
+        parts_clear(p);
+        return -1;
+    }
+    return 0;
+}
+
+static PyObject *
+rat_to_float(PyObject *self)
+{
+    RatObject *r = (RatObject *)self;
+    if (r->big_num == NULL)
+        return PyFloat_FromDouble((double)r->num / (double)r->den);
+    return PyNumber_TrueDivide(r->big_num, r->big_den);
+}
+
+/* For mixed arithmetic with a float: returns self as a float, or
+   NULL with no exception set if other is not a float */
+static PyObject *
+as_float(PyObject *o)
+{
+    if (Rat_Check(o))
+        return rat_to_float(o);
+    if (PyFloat_Check(o)) {
+        Py_INCREF(o);
+        return o;
+    }
+    if (IS_INTEGER(o))
+        return PyNumber_Float(o);
+    return NULL;
+}
+
+typedef PyObject *(*float_op)(PyObject *, PyObject *);
+
+/* Applies op to a and b as floats, if either is a float */
+static PyObject *
+float_fallback(PyObject *a, PyObject *b, float_op op)
+{
+    PyObject *fa, *fb, *result;
+    if (!PyFloat_Check(a) && !PyFloat_Check(b)) {
+        Py_INCREF(Py_NotImplemented);
+        return Py_NotImplemented;
+    }
+    fa = as_float(a);
+    if (fa == NULL) {
+        if (PyErr_Occurred())
+            return NULL;
+        Py_INCREF(Py_NotImplemented);
+        return Py_NotImplemented;
+    }
+    fb = as_float(b);
+    if (fb == NULL) {
+        Py_DECREF(fa);
+        if (PyErr_Occurred())
+            return NULL;
+        Py_INCREF(Py_NotImplemented);
+        return Py_NotImplemented;
+    }
+    result = op(fa, fb);
+    Py_DECREF(fa);
+    Py_DECREF(fb);
+    return result;
+}
+
+/* Gets the parts of both operands.  Returns 1 if both are rational,
+   0 if the operation should be done as floats or is not implemented,
+   and -1 on error. */
+static int
+get_both_parts(PyObject *a, PyObject *b, Parts *pa, Parts *pb)
+{
+    int result = get_parts(a, pa);
+    if (result != 1)
+        return result;
+    result = get_parts(b, pb);
+    if (result != 1)
+        parts_clear(pa);
+    return result;
+}
+
+/********************************************************************
+ Arithmetic
+*/
+
+static PyObject *
+add_big(Parts *a, Parts *b, int subtract)
+{
+    PyObject *t1 = NULL, *t2 = NULL, *num = NULL, *den = NULL;
+    PyObject *result = NULL;
+
+    if (parts_make_big(a) || parts_make_big(b))
+        return NULL;
+    t1 = PyNumber_Multiply(a->big_num, b->big_den);
+    if (t1 == NULL)
+        goto done;
+    t2 = PyNumber_Multiply(b->big_num, a->big_den);
+    if (t2 == NULL)
+        goto done;
+    if (subtract)
+        num = PyNumber_Subtract(t1, t2);
+    else
+        num = PyNumber_Add(t1, t2);
+    if (num == NULL)
+        goto done;
+    den = PyNumber_Multiply(a->big_den, b->big_den);
+    if (den == NULL)
+        goto done;
+    result = rat_from_objects(&RatType, num, den);
+  done:
+    Py_XDECREF(t1);
+    Py_XDECREF(t2);
+    Py_XDECREF(num);
+    Py_XDECREF(den);
+    return result;
+}
+
+static PyObject *rat_get_num(PyObject *self, void *closure);
+static PyObject *rat_get_den(PyObject *self, void *closure);
+
+static PyObject *
+rat_add_sub(PyObject *a, PyObject *b, int subtract)
+{
+    Parts pa, pb;
+    PY_LONG_LONG an, ad, bn, bd, g, s, t, g2;
+    PyObject *result;
+    int ok = get_both_parts(a, b, &pa, &pb);
+
+    if (ok == -1)
+        return NULL;
+    if (ok == 0)
+        return float_fallback(a, b, subtract ? PyNumber_Subtract : PyNumber_Add);
+
+    if (pa.small && pb.small) {
+        an = pa.num; ad = pa.den;
+        bn = subtract ? -pb.num : pb.num; bd = pb.den;
+        if (ad == bd) {
+            if (ad == 1)
+                return rat_from_reduced_ll(an + bn, 1);
+            return rat_from_ll(an + bn, ad);
+        }
+        g = gcd_ll(ad, bd);
+        if (g == 1)
+            /* Already in lowest terms */
+            return rat_from_reduced_ll(an * bd + bn * ad, ad * bd);
+        s = ad / g;
+        t = an * (bd / g) + bn * s;
+        g2 = gcd_ll(t, g);
+        return rat_from_reduced_ll(t / g2, s * (bd / g2));
+    }
+    result = add_big(&pa, &pb, subtract);
+    parts_clear(&pa);
+    parts_clear(&pb);
+    return result;
+}
+
+static PyObject *
+rat_add(PyObject *a, PyObject *b)
+{
+    return rat_add_sub(a, b, 0);
+}
+
+static PyObject *
+rat_sub(PyObject *a, PyObject *b)
+{
+    return rat_add_sub(a, b, 1);
+}
+
+/* a * b, or a / b if divide */
+static PyObject *
+rat_mul_div(PyObject *a, PyObject *b, int divide)
+{
+    Parts pa, pb;
+    PY_LONG_LONG an, ad, bn, bd, g1, g2;
+    PyObject *num = NULL, *den = NULL, *result = NULL;
+    int ok = get_both_parts(a, b, &pa, &pb);
+
+    if (ok == -1)
+        return NULL;
+    if (ok == 0)
+        return float_fallback(a, b, divide ? PyNumber_TrueDivide : PyNumber_Multiply);
+
+    if (pa.small && pb.small) {
+        an = pa.num; ad = pa.den;
+        if (divide) {
+            if (pb.num == 0) {
+                PyErr_SetString(PyExc_ZeroDivisionError, "Rat division by zero");
+                return NULL;
+            }
+            bn = pb.den; bd = pb.num;
+            if (bd < 0) {
+                bn = -bn;
+                bd = -bd;
+            }
+        } else {
+            bn = pb.num; bd = pb.den;
+        }
+        /* Cross-reducing keeps the result in lowest terms */
+        g1 = gcd_ll(an, bd);
+        g2 = gcd_ll(bn, ad);
+        if (g1 == 0)
+            g1 = 1;
+        if (g2 == 0)
+            g2 = 1;
+        return rat_from_reduced_ll((an / g1) * (bn / g2), (ad / g2) * (bd / g1));
+    }
+
+    if (parts_make_big(&pa) || parts_make_big(&pb))
+        goto done;
+    if (divide) {
+        num = PyNumber_Multiply(pa.big_num, pb.big_den);
+        if (num == NULL)
+            goto done;
+        den = PyNumber_Multiply(pa.big_den, pb.big_num);
+    } else {
+        num = PyNumber_Multiply(pa.big_num, pb.big_num);
+        if (num == NULL)
+            goto done;
+        den = PyNumber_Multiply(pa.big_den, pb.big_den);
+    }
+    if (den == NULL)
+        goto done;
+    result = rat_from_objects(&RatType, num, den);
+  done:
+    Py_XDECREF(num);
+    Py_XDECREF(den);
+    parts_clear(&pa);
+    parts_clear(&pb);
+    return result;
+}
+
+static PyObject *
+rat_mul(PyObject *a, PyObject *b)
+{
+    return rat_mul_div(a, b, 0);
+}
+
+static PyObject *
+rat_div(PyObject *a, PyObject *b)
+{
+    return rat_mul_div(a, b, 1);
+}
+
+/* Returns floor(r) as a Python integer */
+static PyObject *
+rat_floor(PyObject *self)
+{
+    RatObject *r = (RatObject *)self;
+    PY_LONG_LONG q;
+    if (r->big_num == NULL) {
+        q = r->num / r->den;
+        if ((r->num % r->den) && r->num < 0)
+            q -= 1;
+        return int_from_ll(q);
+    }
+    return PyNumber_FloorDivide(r->big_num, r->big_den);
+}
+
+static PyObject *
+rat_floordiv(PyObject *a, PyObject *b)
+{
+    PyObject *q, *result;
+    q = rat_div(a, b);
+    if (q == NULL || q == Py_NotImplemented)
+        return q;
+    if (!Rat_Check(q)) {
+        Py_DECREF(q);
+        return float_fallback(a, b, PyNumber_FloorDivide);
+    }
+    result = rat_floor(q);
+    Py_DECREF(q);
+    return result;
+}
+
+/* a - b * floor(a / b) */
+static PyObject *
+rat_mod(PyObject *a, PyObject *b)
+{
+    PyObject *q, *t, *result;
+    q = rat_floordiv(a, b);
+    if (q == NULL || q == Py_NotImplemented)
+        return q;
+    if (PyFloat_Check(q)) {
+        Py_DECREF(q);
+        return float_fallback(a, b, PyNumber_Remainder);
+    }
+    t = PyNumber_Multiply(b, q);
+    Py_DECREF(q);
+    if (t == NULL)
+        return NULL;
+    result = PyNumber_Subtract(a, t);
+    Py_DECREF(t);
+    return result;
+}
+
+static PyObject *
+rat_pow(PyObject *a, PyObject *b, PyObject *z)
+{
+    Parts pa;
+    PyObject *exponent = NULL, *num = NULL, *den = NULL, *result = NULL;
+    PyObject *fa, *fb, *t;
+    int ok, negative;
+
+    if (z != Py_None) {
+        PyErr_SetString(PyExc_TypeError, "pow() 3rd argument not allowed for Rat");
+        return NULL;
+    }
+    if (Rat_Check(b) && ((RatObject *)b)->big_num == NULL &&
+        ((RatObject *)b)->den == 1) {
+        exponent = int_from_ll(((RatObject *)b)->num);
+        if (exponent == NULL)
+            return NULL;
+    } else if (IS_INTEGER(b)) {
+        Py_INCREF(b);
+        exponent = b;
+    }
+    ok = 0;
+    if (exponent != NULL) {
+        ok = get_parts(a, &pa);
+        if (ok == -1) {
+            Py_DECREF(exponent);
+            return NULL;
+        }
+    }
+    if (ok == 0) {
+        /* A fractional power: the result is inexact */
+        Py_XDECREF(exponent);
+        fa = as_float(a);
+        if (fa == NULL) {
+            if (PyErr_Occurred())
+                return NULL;
+            Py_INCREF(Py_NotImplemented);
+            return Py_NotImplemented;
+        }
+        fb = as_float(b);
+        if (fb == NULL) {
+            Py_DECREF(fa);
+            if (PyErr_Occurred())
+                return NULL;
+            Py_INCREF(Py_NotImplemented);
+            return Py_NotImplemented;
+        }
+        result = PyNumber_Power(fa, fb, Py_None);
+        Py_DECREF(fa);
+        Py_DECREF(fb);
+        return result;
+    }
+
+    if (parts_make_big(&pa))
+        goto done;
+    t = int_from_ll(0);
+    if (t == NULL)
+        goto done;
+    negative = PyObject_RichCompareBool(exponent, t, Py_LT);
+    Py_DECREF(t);
+    if (negative == -1)
+        goto done;
+    if (negative) {
+        t = PyNumber_Negative(exponent);
+        if (t == NULL)
+            goto done;
+        Py_DECREF(exponent);
+        exponent = t;
+    }
+    num = PyNumber_Power(pa.big_num, exponent, Py_None);
+    if (num == NULL)
+        goto done;
+    den = PyNumber_Power(pa.big_den, exponent, Py_None);
+    if (den == NULL)
+        goto done;
+    if (negative)
+        result = rat_from_objects(&RatType, den, num);
+    else
+        result = rat_from_objects(&RatType, num, den);
+  done:
+    Py_XDECREF(exponent);
+    Py_XDECREF(num);
+    Py_XDECREF(den);
+    parts_clear(&pa);
+    return result;
+}
+
+static PyObject *
+rat_neg(PyObject *self)
+{
+    RatObject *r = (RatObject *)self;
+    PyObject *num, *den, *result;
+    if (r->big_num == NULL && r->num > -PY_LLONG_MAX)
+        return rat_from_reduced_ll(-r->num, r->den);
+    num = rat_get_num(self, NULL);
+    if (num == NULL)
+        return NULL;
+    result = PyNumber_Negative(num);
+    Py_DECREF(num);
+    if (result == NULL)
+        return NULL;
+    num = result;
+    den = rat_get_den(self, NULL);
+    if (den == NULL) {
+        Py_DECREF(num);
+        return NULL;
+    }
+    result = rat_from_objects(&RatType, num, den);
+    Py_DECREF(num);
+    Py_DECREF(den);
+    return result;
+}
+
+static PyObject *
+rat_pos(PyObject *self)
+{
+    Py_INCREF(self);
+    return self;
+}
+
+/* Returns 1 if r < 0, 0 if not and -1 on error */
+static int
+rat_is_negative(RatObject *r)
+{
+    PyObject *zero;
+    int negative;
+    if (r->big_num == NULL)
+        return r->num < 0;
+    zero = int_from_ll(0);
+    if (zero == NULL)
+        return -1;
+    negative = PyObject_RichCompareBool(r->big_num, zero, Py_LT);
+    Py_DECREF(zero);
+    return negative;
+}
+
+static PyObject *
+rat_abs(PyObject *self)
+{
+    int negative = rat_is_negative((RatObject *)self);
+    if (negative == -1)
+        return NULL;
+    if (negative)
+        return rat_neg(self);
+    return rat_pos(self);
+}
+
+static int
+rat_nonzero(PyObject *self)
+{
+    RatObject *r = (RatObject *)self;
+    if (r->big_num == NULL)
+        return r->num != 0;
+    return PyObject_IsTrue(r->big_num);
+}
+
+/* int() floors, like the pure Python Rat */
+static PyObject *
+rat_int(PyObject *self)
+{
+    return rat_floor(self);
+}
+
+/********************************************************************
+ Comparison and hashing
+*/
+
+static PyObject *
+rat_richcompare(PyObject *a, PyObject *b, int op)
+{
+    Parts pa, pb;
+    PyObject *left = NULL, *right = NULL, *result = NULL;
+    PY_LONG_LONG l, r;
+    int c, ok;
+
+    ok = get_both_parts(a, b, &pa, &pb);
+    if (ok == -1)
+        return NULL;
+    if (ok == 0) {
+        /* Like the pure Python Rat, compare as floats */
+        PyObject *fa, *fb;
+        if (!PyFloat_Check(a) && !PyFloat_Check(b)) {
+            Py_INCREF(Py_NotImplemented);
+            return Py_NotImplemented;
+        }
+        fa = as_float(a);
+        if (fa == NULL) {
+            if (PyErr_Occurred())
+                return NULL;
+            Py_INCREF(Py_NotImplemented);
+            return Py_NotImplemented;
+        }
+        fb = as_float(b);
+        if (fb == NULL) {
+            Py_DECREF(fa);
+            if (PyErr_Occurred())
+                return NULL;
+            Py_INCREF(Py_NotImplemented);
+            return Py_NotImplemented;
+        }
+        result = PyObject_RichCompare(fa, fb, op);
+        Py_DECREF(fa);
+        Py_DECREF(fb);
+        return result;
+    }
+
+    if (pa.small && pb.small) {
+        l = pa.num * pb.den;
+        r = pb.num * pa.den;
+        switch (op) {
+        case Py_LT: c = l < r; break;
+        case Py_LE: c = l <= r; break;
+        case Py_EQ: c = l == r; break;
+        case Py_NE: c = l != r; break;
+        case Py_GT: c = l > r; break;
+        default: c = l >= r; break;
+        }
+        result = c ? Py_True : Py_False;
+        Py_INCREF(result);
+        return result;
+    }
+
+    if (parts_make_big(&pa) || parts_make_big(&pb))
+        goto done;
+    left = PyNumber_Multiply(pa.big_num, pb.big_den);
+    if (left == NULL)
+        goto done;
+    right = PyNumber_Multiply(pb.big_num, pa.big_den);
+    if (right == NULL)
+        goto done;
+    result = PyObject_RichCompare(left, right, op);
+  done:
+    Py_XDECREF(left);
+    Py_XDECREF(right);
+    parts_clear(&pa);
+    parts_clear(&pb);
+    return result;
+}
+
+#ifdef IS_PY3K
+/* The same hash as numbers.Rational (and so int, float and
+   fractions.Fraction) for the same value */
+static Py_hash_t
+rat_hash_value(RatObject *r)
+{
+    PyObject *modulus, *inverse, *num, *h, *t;
+    Py_hash_t result = -1;
+
+    if (r->big_num == NULL && r->den == 1) {
+        num = int_from_ll(r->num);
+        if (num == NULL)
+            return -1;
+        result = PyObject_Hash(num);
+        Py_DECREF(num);
+        return result;
+    }
+    num = r->big_num ? (Py_INCREF(r->big_num), r->big_num) : int_from_ll(r->num);
+    if (num == NULL)
+        return -1;
+    modulus = PyLong_FromSsize_t(_PyHASH_MODULUS);
+    if (modulus == NULL) {
+        Py_DECREF(num);
+        return -1;
+    }
+    t = r->big_den ? (Py_INCREF(r->big_den), r->big_den) : int_from_ll(r->den);
+    if (t == NULL)
+        goto done;
+    /* den ** (P - 2) % P is the inverse of den, modulo the prime P */
+    h = PyLong_FromSsize_t(_PyHASH_MODULUS - 2);
+    if (h == NULL) {
+        Py_DECREF(t);
+        goto done;
+    }
+    inverse = PyNumber_Power(t, h, modulus);
+    Py_DECREF(t);
+    Py_DECREF(h);
+    if (inverse == NULL)
+        goto done;
+    if (!PyObject_IsTrue(inverse)) {
+        result = _PyHASH_INF;
+    } else {
+        t = PyNumber_Absolute(num);
+        if (t == NULL) {
+            Py_DECREF(inverse);
+            goto done;
+        }
+        h = PyNumber_Multiply(t, inverse);
+        Py_DECREF(t);
+        if (h == NULL) {
+            Py_DECREF(inverse);
+            goto done;
+        }
+        t = PyNumber_Remainder(h, modulus);
+        Py_DECREF(h);
+        if (t == NULL) {
+            Py_DECREF(inverse);
+            goto done;
+        }
+        result = PyLong_AsSsize_t(t);
+        Py_DECREF(t);
+    }
+    Py_DECREF(inverse);
+    if (result != -1 || !PyErr_Occurred()) {
+        int negative = rat_is_negative(r);
+        if (negative == -1)
+            result = -1;
+        else {
+            if (negative)
+                result = -result;
+            if (result == -1)
+                result = -2;
+        }
+    }
+  done:
+    Py_DECREF(num);
+    Py_DECREF(modulus);
+    return result;
+}
+#else
+/* Integers hash like ints, and values that are exactly floats hash
+   like floats */
+static Py_hash_t
+rat_hash_value(RatObject *r)
+{
+    PyObject *o, *f;
+    Py_hash_t result;
+    int exact;
+
+    if (r->big_num == NULL && r->den == 1) {
+        o = int_from_ll(r->num);
+        if (o == NULL)
+            return -1;
+        result = PyObject_Hash(o);
+        Py_DECREF(o);
+        return result;
+    }
+    f = rat_to_float((PyObject *)r);
+    if (f == NULL) {
+        PyErr_Clear();
+    } else {
+        o = rat_richcompare((PyObject *)r, f, Py_EQ);
+        if (o == NULL) {
+            Py_DECREF(f);
+            return -1;
+        }
+        exact = (o == Py_True);
+        Py_DECREF(o);
+        if (exact) {
+            result = PyObject_Hash(f);
+            Py_DECREF(f);
+            return result;
+        }
+        Py_DECREF(f);
+    }
+    if (r->big_num == NULL)
+        o = Py_BuildValue("(LL)", r->num, r->den);
+    else
+        o = PyTuple_Pack(2, r->big_num, r->big_den);
+    if (o == NULL)
+        return -1;
+    result = PyObject_Hash(o);
+    Py_DECREF(o);
+    return result;
+}
+#endif
+
+static Py_hash_t
+rat_hash(PyObject *self)
+{
+    RatObject *r = (RatObject *)self;
+    if (r->hash == -1)
+        r->hash = rat_hash_value(r);
+    return r->hash;
+}
+
+/********************************************************************
+ Type
+*/
+
+static PyObject *
+rat_new(PyTypeObject *type, PyObject *args, PyObject *kwds)
+{
+    static char *kwlist[] = {"num", "den", NULL};
+    PyObject *num, *den = NULL, *result = NULL;
+    PyObject *ratio_num = NULL, *ratio_den = NULL, *q;
+    Parts pn, pd;
+    int ok;
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "O|O:Rat", kwlist, &num, &den))
+        return NULL;
+
+    /* Floats are converted exactly */
+    if (PyFloat_Check(num)) {
+        q = PyObject_CallMethod(num, "as_integer_ratio", NULL);
+        if (q == NULL)
+            return NULL;
+        num = rat_from_objects(type, PyTuple_GET_ITEM(q, 0), PyTuple_GET_ITEM(q, 1));
+        Py_DECREF(q);
+        if (num == NULL)
+            return NULL;
+        ratio_num = num;
+    }
+    if (den != NULL && PyFloat_Check(den)) {
+        q = PyObject_CallMethod(den, "as_integer_ratio", NULL);
+        if (q == NULL)
+            goto done;
+        den = rat_from_objects(type, PyTuple_GET_ITEM(q, 0), PyTuple_GET_ITEM(q, 1));
+        Py_DECREF(q);
+        if (den == NULL)
+            goto done;
+        ratio_den = den;
+    }
+
+    if (den == NULL) {
+        if (Rat_Check(num) && type == &RatType) {
+            Py_INCREF(num);
+            result = num;
+            goto done;
+        }
+        ok = get_parts(num, &pn);
+        if (ok == 0)
+            PyErr_SetString(PyExc_TypeError, "Rat() argument must be an integer, float or Rat");
+        if (ok != 1)
+            goto done;
+        if (parts_make_big(&pn))
+            goto done;
+        result = rat_from_objects(type, pn.big_num, pn.big_den);
+        parts_clear(&pn);
+        goto done;
+    }
+
+    ok = get_parts(num, &pn);
+    if (ok == 1) {
+        ok = get_parts(den, &pd);
+        if (ok != 1)
+            parts_clear(&pn);
+    }
+    if (ok == 0)
+        PyErr_SetString(PyExc_TypeError, "Rat() arguments must be integers, floats or Rats");
+    if (ok != 1)
+        goto done;
+    if (type == &RatType && !Rat_Check(num) && !Rat_Check(den) &&
+        pn.small && pd.small) {
+        result = rat_from_ll(pn.num, pd.num);
+    } else {
+        q = rat_div(num, den);
+        if (q != NULL && type != &RatType) {
+            /* A subclass: copy the value into an instance of it */
+            RatObject *r = (RatObject *)q;
+            PyObject *n = r->big_num ? (Py_INCREF(r->big_num), r->big_num) : int_from_ll(r->num);
+            PyObject *d = r->big_den ? (Py_INCREF(r->big_den), r->big_den) : int_from_ll(r->den);
+            if (n != NULL && d != NULL)
+                result = rat_from_objects(type, n, d);
+            Py_XDECREF(n);
+            Py_XDECREF(d);
+            Py_DECREF(q);
+        } else {
+            result = q;
+        }
+    }
+    parts_clear(&pn);
+    parts_clear(&pd);
+  done:
+    Py_XDECREF(ratio_num);
+    Py_XDECREF(ratio_den);
+    return result;
+}
+
+static void
+rat_dealloc(PyObject *self)
+{
+    RatObject *r = (RatObject *)self;
+    Py_XDECREF(r->big_num);
+    Py_XDECREF(r->big_den);
+    Py_TYPE(self)->tp_free(self);
+}
+
+static PyObject *
+rat_get_num(PyObject *self, void *closure)
+{
+    RatObject *r = (RatObject *)self;
+    if (r->big_num == NULL)
+        return int_from_ll(r->num);
+    Py_INCREF(r->big_num);
+    return r->big_num;
+}
+
+static PyObject *
+rat_get_den(PyObject *self, void *closure)
+{
+    RatObject *r = (RatObject *)self;
+    if (r->big_num == NULL)
+        return int_from_ll(r->den);
+    Py_INCREF(r->big_den);
+    return r->big_den;
+}
+
+static PyObject *
+rat_repr(PyObject *self)
+{
+    PyObject *num, *den, *result;
+    num = rat_get_num(self, NULL);
+    den = rat_get_den(self, NULL);
+    if (num == NULL || den == NULL) {
+        Py_XDECREF(num);
+        Py_XDECREF(den);
+        return NULL;
+    }
+#ifdef IS_PY3K
+    result = PyUnicode_FromFormat("Rat(%S,%S)", num, den);
+#else
+    {
+        PyObject *fmt = PyString_FromString("Rat(%s,%s)");
+        PyObject *tuple = PyTuple_Pack(2, num, den);
+        result = (fmt && tuple) ? PyString_Format(fmt, tuple) : NULL;
+        Py_XDECREF(fmt);
+        Py_XDECREF(tuple);
+    }
+#endif
+    Py_DECREF(num);
+    Py_DECREF(den);
+    return result;
+}
+
+/* Returns 1 if the denominator of r is 1, 0 if not and -1 on error */
+static int
+rat_is_whole(RatObject *r)
+{
+    PyObject *one;
+    int whole;
+    if (r->big_num == NULL)
+        return r->den == 1;
+    one = int_from_ll(1);
+    if (one == NULL)
+        return -1;
+    whole = PyObject_RichCompareBool(r->big_den, one, Py_EQ);
+    Py_DECREF(one);
+    return whole;
+}
+
+static PyObject *
+rat_str(PyObject *self)
+{
+    PyObject *num, *den, *result;
+    int whole = rat_is_whole((RatObject *)self);
+    if (whole == -1)
+        return NULL;
+    if (whole) {
+        num = rat_get_num(self, NULL);
+        if (num == NULL)
+            return NULL;
+        result = PyObject_Str(num);
+        Py_DECREF(num);
+        return result;
+    }
+    num = rat_get_num(self, NULL);
+    den = rat_get_den(self, NULL);
+    if (num == NULL || den == NULL) {
+        Py_XDECREF(num);
+        Py_XDECREF(den);
+        return NULL;
+    }
+#ifdef IS_PY3K
+    result = PyUnicode_FromFormat("(%S/%S)", num, den);
+#else
+    {
+        PyObject *fmt = PyString_FromString("(%s/%s)");
+        PyObject *tuple = PyTuple_Pack(2, num, den);
+        result = (fmt && tuple) ? PyString_Format(fmt, tuple) : NULL;
+        Py_XDECREF(fmt);
+        Py_XDECREF(tuple);
+    }
+#endif
+    Py_DECREF(num);
+    Py_DECREF(den);
+    return result;
+}
+
+static PyObject *
+rat_reduce(PyObject *self)
+{
+    PyObject *num, *den, *result;
+    num = rat_get_num(self, NULL);
+    den = rat_get_den(self, NULL);
+    if (num == NULL || den == NULL) {
+        Py_XDECREF(num);
+        Py_XDECREF(den);
+        return NULL;
+    }
+    result = Py_BuildValue("(O(OO))", Py_TYPE(self), num, den);
+    Py_DECREF(num);
+    Py_DECREF(den);
+    return result;
+}
+
+static PyGetSetDef rat_getset[] = {
+    {"num", rat_get_num, NULL, "The numerator, in lowest terms", NULL},
+    {"den", rat_get_den, NULL, "The (positive) denominator, in lowest terms", NULL},
+    {"numerator", rat_get_num, NULL, "The numerator, in lowest terms", NULL},
+    {"denominator", rat_get_den, NULL, "The (positive) denominator, in lowest terms", NULL},
+    {NULL}
+};
+
+static PyMethodDef rat_methods[] = {
+    {"__reduce__", (PyCFunction)rat_reduce, METH_NOARGS, NULL},
+    {NULL}
+};
+
+static PyNumberMethods rat_as_number = {
+    rat_add,                    /* nb_add */
+    rat_sub,                    /* nb_subtract */
+    rat_mul,                    /* nb_multiply */
+#ifndef IS_PY3K
+    rat_div,                    /* nb_divide */
+#endif
+    rat_mod,                    /* nb_remainder */
+    0,                          /* nb_divmod */
+    rat_pow,                    /* nb_power */
+    rat_neg,                    /* nb_negative */
+    rat_pos,                    /* nb_positive */
+    rat_abs,                    /* nb_absolute */
+    rat_nonzero,                /* nb_nonzero / nb_bool */
+    0,                          /* nb_invert */
+    0,                          /* nb_lshift */
+    0,                          /* nb_rshift */
+    0,                          /* nb_and */
+    0,                          /* nb_xor */
+    0,                          /* nb_or */
+#ifndef IS_PY3K
+    0,                          /* nb_coerce */
+#endif
+    rat_int,                    /* nb_int */
+#ifdef IS_PY3K
+    0,                          /* nb_reserved */
+#else
+    rat_int,                    /* nb_long */
+#endif
+    rat_to_float,               /* nb_float */
+#ifndef IS_PY3K
+    0,                          /* nb_oct */
+    0,                          /* nb_hex */
+#endif
+    0,                          /* nb_inplace_add */
+    0,                          /* nb_inplace_subtract */
+    0,                          /* nb_inplace_multiply */
+#ifndef IS_PY3K
+    0,                          /* nb_inplace_divide */
+#endif
+    0,                          /* nb_inplace_remainder */
+    0,                          /* nb_inplace_power */
+    0,                          /* nb_inplace_lshift */
+    0,                          /* nb_inplace_rshift */
+    0,                          /* nb_inplace_and */
+    0,                          /* nb_inplace_xor */
+    0,                          /* nb_inplace_or */
+    rat_floordiv,               /* nb_floor_divide */
+    rat_div,                    /* nb_true_divide */
+};
+
+static char rat_doc[] =
+"Rat(num, den=1)\n\n"
+"An exact rational number, always in lowest terms.  num and den may\n"
+"be integers, Rats or floats (which are converted exactly).\n"
+"Arithmetic with integers and Rats is exact; arithmetic with floats\n"
+"gives a float.";
+
+static PyTypeObject RatType = {
+    PyVarObject_HEAD_INIT(NULL, 0)
+    "pyScore.util._rational.Rat", /* tp_name */
+    sizeof(RatObject),          /* tp_basicsize */
+    0,                          /* tp_itemsize */
+    rat_dealloc,                /* tp_dealloc */
+    0,                          /* tp_print */
+    0,                          /* tp_getattr */
+    0,                          /* tp_setattr */
+    0,                          /* tp_compare */
+    rat_repr,                   /* tp_repr */
+    &rat_as_number,             /* tp_as_number */
+    0,                          /* tp_as_sequence */
+    0,                          /* tp_as_mapping */
+    rat_hash,                   /* tp_hash */
+    0,                          /* tp_call */
+    rat_str,                    /* tp_str */
+    0,                          /* tp_getattro */
+    0,                          /* tp_setattro */
+    0,                          /* tp_as_buffer */
+    TP_FLAGS | Py_TPFLAGS_BASETYPE, /* tp_flags */
+    rat_doc,                    /* tp_doc */
+    0,                          /* tp_traverse */
+    0,                          /* tp_clear */
+    rat_richcompare,            /* tp_richcompare */
+    0,                          /* tp_weaklistoffset */
+    0,                          /* tp_iter */
+    0,                          /* tp_iternext */
+    rat_methods,                /* tp_methods */
+    0,                          /* tp_members */
+    rat_getset,                 /* tp_getset */
+    0,                          /* tp_base */
+    0,                          /* tp_dict */
+    0,                          /* tp_descr_get */
+    0,                          /* tp_descr_set */
+    0,                          /* tp_dictoffset */
+    0,                          /* tp_init */
+    0,                          /* tp_alloc */
+    rat_new,                    /* tp_new */
+};
+
+/********************************************************************
+ Module
+*/
+
+static char module_doc[] =
+"Exact rational numbers, for pyScore.util.rational";
+
+#ifdef IS_PY3K
+static struct PyModuleDef rational_module = {
+    PyModuleDef_HEAD_INIT,
+    "_rational",
+    module_doc,
+    -1,
+    NULL
+};
+
+PyMODINIT_FUNC
+PyInit__rational(void)
+{
+    PyObject *m;
+    if (PyType_Ready(&RatType) < 0)
+        return NULL;
+    m = PyModule_Create(&rational_module);
+    if (m == NULL)
+        return NULL;
+    Py_INCREF(&RatType);
+    PyModule_AddObject(m, "Rat", (PyObject *)&RatType);
+    return m;
+}
+#else
+PyMODINIT_FUNC
+init_rational(void)
+{
+    PyObject *m;
+    if (PyType_Ready(&RatType) < 0)
+        return;
+    m = Py_InitModule3("_rational", NULL, module_doc);
+    if (m == NULL)
+        return;
+    Py_INCREF(&RatType);
+    PyModule_AddObject(m, "Rat", (PyObject *)&RatType);
+}
+#endif